@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+import argparse
+from functools import partial
+import logging
+from purepyindi2 import device, properties, constants, transports
+from purepyindi2.messages import DefNumber, DefSwitch
+
+log = logging.getLogger(__name__)
+
+class MyDevice(device.Device):
+    def handle_prop1(self, existing_property, new_message):
+        existing_property['elem1'] = new_message['elem1']
+        self.update_property(existing_property)
+
+    def setup(self):
+        nv = properties.NumberVector(name='prop1')
+        print(nv.to_xml_str())
+        # keep a reference to the element so loop() can skip the lookups
+        self._elem1 = DefNumber(
+            name='elem1', label='Element 1', format='%3.1f',
+            min=0, max=10, step=0.1, _value=0.0
+        )
+        nv.add_element(self._elem1)
+        self.add_property(nv, callback=self.handle_prop1)
+        log.debug("Set up complete")
+
+    def loop(self):
+        prop = self.properties['prop1']
+        if self._elem1.value == 5:
+            self._elem1.value = 0
+            print('set zero')
+        else:
+            self._elem1.value = 5
+            print('set 5')
+        log.debug("Switching elem1 prop=%r", prop)
+        self.update_property(prop)
+
+class ExampleDevice(device.Device):
+    def handle_toggle(self, existing_property, new_message):
+        existing_property['toggle'] = new_message['toggle']
+        self.update_property(existing_property)
+        log.debug("Handled toggle to %s", existing_property['toggle'])
+
+    def handle_switch(self, switches_turned_on : set[str], switches_turned_off: set[str]) -> bool:
+        log.debug("switches_turned_on=%s switches_turned_off=%s", switches_turned_on, switches_turned_off)
+        if 'third' in switches_turned_on:
+            # always fail to apply changes when this switch is requested
+            return False
+        else:
+            # succeed otherwise
+            return True
+
+    def setup(self):
+        sv = properties.SwitchVector(
+            name="toggle",
+            rule=constants.SwitchRule.ANY_OF_MANY,
+            perm=constants.PropertyPerm.READ_WRITE,
+        )
+        sv.add_element(DefSwitch(name="toggle", _value=constants.SwitchState.OFF))
+        self.add_property(sv, callback=self.handle_toggle)
+        log.debug("%s", sv)
+
+        sv = properties.SwitchVector(
+            name="one_of_many",
+            rule=constants.SwitchRule.ONE_OF_MANY,
+            perm=constants.PropertyPerm.READ_WRITE,
+        )
+        sv.add_element(DefSwitch(name="first", _value=constants.SwitchState.ON))
+        sv.add_element(DefSwitch(name="second", _value=constants.SwitchState.OFF))
+        sv.add_element(DefSwitch(name="third", _value=constants.SwitchState.OFF))
+        self.add_property(sv, callback=sv.switch_callback(self.handle_switch, self))
+        log.debug("%s", sv)
+
+        nv = properties.NumberVector(name='uptime')
+        # keep a reference to the element so loop() can skip the lookups
+        self._uptime_elem = DefNumber(
+            name='uptime_sec', label='Uptime', format='%3.1f',
+            min=0, max=1_000_000, step=1, _value=0.0
+        )
+        nv.add_element(self._uptime_elem)
+        self._uptime_prop = nv
+        self.add_property(nv)
+        log.debug("Set up complete")
+
+    def loop(self):
+        self._uptime_elem.value += 1
+        self.update_property(self._uptime_prop)
+        log.debug("Current uptime: %s", self._uptime_prop)
+
+DEVICE_CLASSES = {cls.__name__: cls for cls in (MyDevice, ExampleDevice)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an example purepyindi2 device")
+    parser.add_argument('--class', dest='device_class', choices=DEVICE_CLASSES, default='MyDevice')
+    parser.add_argument('--transport', choices=('pipe', 'fifo'), default='pipe')
+    parser.add_argument('--name', default='purepyindi_example')
+    args = parser.parse_args()
+    if args.transport == 'fifo':
+        connection_class = partial(transports.IndiFifoConnection, name=args.name)
+    else:
+        connection_class = transports.IndiPipeConnection
+    logging.basicConfig(level=logging.DEBUG)
+    DEVICE_CLASSES[args.device_class](name=args.name, connection_class=connection_class).main()
+
+if __name__ == "__main__":
+    main()
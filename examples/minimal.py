@@ -5,8 +5,10 @@ import logging
 logging.basicConfig(level="ERROR")
 logging.getLogger('purepyindi2').setLevel('DEBUG')
 
+DEF_SET_MESSAGES = typing.get_args(messages.IndiDefSetMessage)
+
 def print_updates(msg):
-    if isinstance(msg, typing.get_args(messages.IndiDefSetMessage)):
+    if isinstance(msg, DEF_SET_MESSAGES):
         for element in msg:
             print(f"{msg.device}.{msg.name}.{element}={msg.get()}")
 
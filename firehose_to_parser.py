@@ -1,24 +1,23 @@
+import selectors
 import socket
 from purepyindi2.messages import Message
 from purepyindi2.parser import IndiStreamParser
 conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 conn.connect(("localhost", 7624))
-conn.settimeout(10)
 conn.sendall(b'<getProperties version="1.7" />\n\n')
-import queue
-q = queue.Queue()
-parser = IndiStreamParser(q)
+conn.setblocking(False)
+sel = selectors.DefaultSelector()
+sel.register(conn, selectors.EVENT_READ)
+parser = IndiStreamParser()
 
 while True:
-    try:
-        data = conn.recv(1024)
-        parser.parse(data)
+    for key, _ in sel.select(timeout=1.0):
         try:
-            while True:
-                msg = q.get_nowait()
-                print(msg)
-        except queue.Empty:
-            pass
-    except socket.timeout:
-        continue
-    # print(data.decode('utf8'))
\ No newline at end of file
+            data = key.fileobj.recv(65536)
+        except BlockingIOError:
+            continue
+        if data == b'':
+            raise SystemExit("Got EOF from server")
+        for msg in parser.parse(data):
+            print(msg)
+    # print(data.decode('utf8'))
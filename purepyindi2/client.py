@@ -1,28 +1,65 @@
+import functools
 import logging
 import threading
 import time
 import typing
 import warnings
-from collections import defaultdict
 from . import constants, transports, properties, messages, utils
 
 log = logging.getLogger(__name__)
 
 __all__ = ['IndiClient']
 
+# Unpacked once here rather than calling typing.get_args per message.
+# Inbound messages are instances of exactly these classes (the parser
+# never subclasses them), so handle_message looks up a handler by
+# type(message) instead of walking the tuples with isinstance.
+_DEF_MSGS = frozenset(typing.get_args(messages.IndiDefMessage))
+_SET_MSGS = frozenset(typing.get_args(messages.IndiSetMessage))
+
+@functools.lru_cache(maxsize=1024)
+def _parse_key(key : str) -> tuple[str, typing.Optional[str], typing.Optional[str]]:
+    '''Split a ``device.property.element`` key into a
+    ``(device, property, element)`` tuple, with `None` for the parts
+    not given. Memoized since the same keys tend to be accessed
+    repeatedly'''
+    device_name, sep, rest = key.partition('.')
+    if not sep:
+        return device_name, None, None
+    property_name, sep, element_name = rest.partition('.')
+    return device_name, property_name, (element_name if sep else None)
+
 class IndiClient:
     _has_connected_once : bool = False
     def __init__(self, connection=None):
-        self._devices = defaultdict(dict)
-        # funky nested defaultdict for callbacks supports 3-level lookups like
-        # callbacks['device']['name'].append(callback_fn)  # property level
-        # callbacks['device'][constants.ALL].append(callback_fn)  # device level
-        # callbacks[constants.ALL][constants.ALL].append(callback_fn)  # world level
-        self.callbacks = defaultdict(lambda: defaultdict(list))
+        self._devices = {}
+        # callbacks are kept in one bucket per scope, so dispatch is
+        # at most three lookups:
+        # _cb_world  # world level, (ALL, ...)
+        # _cb_device['device']  # device level, ('device', ALL)
+        # _cb_prop[('device', 'name')]  # property level
+        self._cb_world = []
+        self._cb_device = {}
+        self._cb_prop = {}
+        self._cb_total = 0  # lets dispatch_callbacks bail out with one test
         self.callbacks_lock = threading.Lock()
-        self._interested_properties = set()
+        # interests are stored by scope so that handle_message can
+        # check them without building and hashing tuples
+        self._interest_all = False  # (ALL, ALL)
+        self._interest_device = set()  # (device, ALL)
+        self._interest_prop = {}  # (device, property) as {device: {property, ...}}
+        # set once every interest has at least one property definition,
+        # so get_properties_and_wait can block instead of polling
+        self._interests_satisfied = threading.Event()
+        # guards the interest index against the reader thread, and makes
+        # "check what's missing, then set/clear the event" atomic
+        self._interest_lock = threading.RLock()
         self.connection = connection
         self.last_get_properties_scope = None
+        self._get_properties_cache = {}
+        self._message_handlers = {messages.DelProperty: self._handle_del_property}
+        self._message_handlers.update(dict.fromkeys(_DEF_MSGS, self._handle_def))
+        self._message_handlers.update(dict.fromkeys(_SET_MSGS, self._handle_set))
         if self.connection is not None:
             self.connect()
 
@@ -35,22 +72,38 @@ class IndiClient:
 
     @property
     def devices(self):
-        return set(self._devices.keys())
+        return set(self._devices)
+
+    @property
+    def callbacks(self):
+        '''Snapshot of the registered callbacks in the nested
+        ``callbacks[device_name][property_name]`` layout, with
+        `constants.ALL` for device- and world-level entries. Read-only;
+        use `register_callback` and `unregister_callback` to change it.
+        '''
+        with self.callbacks_lock:
+            result = {}
+            if self._cb_world:
+                result[constants.ALL] = {constants.ALL: list(self._cb_world)}
+            for device_name, cbs in self._cb_device.items():
+                result.setdefault(device_name, {})[constants.ALL] = list(cbs)
+            for (device_name, property_name), cbs in self._cb_prop.items():
+                result.setdefault(device_name, {})[property_name] = list(cbs)
+        return result
 
     def to_serializable(self) -> dict[str, dict[str, properties.IndiProperty]]:
         '''Return a dict mapping device names to dicts of
         properties (dataclasses, keyed by name). Can be serialized by
         a dataclass- and enum-aware serializer.
         '''
-        devices = {}
-        for devname in self._devices:
-            devices[devname] = {}
-            thisdev = devices[devname]
-            for propname in self._devices[devname]:
-                thisdev[propname] = self._devices[devname][propname].to_serializable()
-                # _role is always client in this context, save some bytes
-                del thisdev[propname]['_role']
-        return {'devices': devices}
+        # _role is always client in this context, save some bytes
+        return {'devices': {
+            devname: {
+                propname: prop.to_serializable(include_role=False)
+                for propname, prop in thisdev.items()
+            }
+            for devname, thisdev in self._devices.items()
+        }}
 
     def to_json(self, **kwargs):
         '''Serialize devices and properties with orjson, passing
@@ -70,10 +123,10 @@ class IndiClient:
             as the device name to request properties from. If passed a
             ``device.property`` pair, then only that property will be
             requested. If passed an iterable, a ``<getProperties>``
-            message will be emitted for each.
+            message will be emitted for each, sent as one batch.
         '''
         if len(args) == 0:
-            msg = messages.GetProperties()
+            msg = self._get_properties_message()
             self._register_interest(constants.ALL, constants.ALL)
             self.connection.send(msg)
             if self.last_get_properties_scope is not None:
@@ -83,51 +136,78 @@ class IndiClient:
                     property) scope, enumerating all devices and
                     properties is not possible without disconnecting
                     and reconnecting."""))
-        elif len(args) == 1 and utils.is_iterable(args[0]) and not isinstance(args[0], str):
-            for spec in args[0]:
-                self.get_properties(spec)
         elif isinstance(args[0], str):
-            if '.' in args[0]:
-                parts = args[0].split('.')
-            else:
-                parts = [args[0]]
-            device_name = parts[0]
-            if len(parts) == 2:
-                property_name = parts[1]
-                msg = messages.GetProperties(device=device_name, name=property_name)
-            else:
-                property_name = constants.ALL
-                if self.last_get_properties_scope is not None and self.last_get_properties_scope[1] is not constants.ALL:
-                    warnings.warn(utils.unwrap(f"""
-                        Since get_properties() was first called with
-                        {self.last_get_properties_scope} (device,
-                        property) scope, enumerating all properties is
-                        not possible without disconnecting and
-                        reconnecting."""))
-                msg = messages.GetProperties(device=device_name)
-            self._register_interest(device_name, property_name)
-            if self.last_get_properties_scope is None:
-                self.last_get_properties_scope = (device_name, property_name)
-            self.connection.send(msg)
+            self.connection.send(self._scoped_get_properties(args[0]))
+        elif len(args) == 1 and utils.is_iterable(args[0]):
+            self.connection.send_many([self._scoped_get_properties(spec) for spec in args[0]])
         else:
             raise ValueError("Supply arguments as list of dotted property specs or as (device, property)")
 
+    def _scoped_get_properties(self, spec : str) -> messages.GetProperties:
+        '''Register interest in a ``device`` or ``device.property`` spec
+        and return the ``<getProperties>`` message requesting it'''
+        if not isinstance(spec, str):
+            raise ValueError("Supply arguments as list of dotted property specs or as (device, property)")
+        device_name, sep, property_name = spec.partition('.')
+        if sep and '.' not in property_name:
+            msg = self._get_properties_message(device_name, property_name)
+        else:
+            property_name = constants.ALL
+            if self.last_get_properties_scope is not None and self.last_get_properties_scope[1] is not constants.ALL:
+                warnings.warn(utils.unwrap(f"""
+                    Since get_properties() was first called with
+                    {self.last_get_properties_scope} (device,
+                    property) scope, enumerating all properties is
+                    not possible without disconnecting and
+                    reconnecting."""))
+            msg = self._get_properties_message(device_name)
+        self._register_interest(device_name, property_name)
+        if self.last_get_properties_scope is None:
+            self.last_get_properties_scope = (device_name, property_name)
+        return msg
+
+    def _get_properties_message(self, device_name=None, property_name=None) -> messages.GetProperties:
+        '''Return a (reused) ``<getProperties>`` message for the given scope'''
+        key = (device_name, property_name)
+        msg = self._get_properties_cache.get(key)
+        if msg is None:
+            msg = messages.GetProperties(device=device_name, name=property_name)
+            self._get_properties_cache[key] = msg
+        return msg
+
+    @property
+    def _interested_properties(self) -> set[tuple]:
+        '''All registered interests as a set of `(device_name, property_name)`
+        pairs, with `constants.ALL` as the wildcard'''
+        interests = set()
+        with self._interest_lock:
+            if self._interest_all:
+                interests.add((constants.ALL, constants.ALL))
+            for device_name in self._interest_device:
+                interests.add((device_name, constants.ALL))
+            for device_name, property_names in self._interest_prop.items():
+                for property_name in property_names:
+                    interests.add((device_name, property_name))
+        return interests
+
     @property
     def interested_properties_missing(self):
-        any_missing = False
+        debug = log.isEnabledFor(logging.DEBUG)
         for device_name, property_name in self._interested_properties:
-            log.debug(f"{device_name=} {property_name=} {len(self._devices)=} {len(self._devices.get(device_name, []))=}")
-            if device_name is constants.ALL and len(self._devices) == 0:
-                any_missing = True
-            if self._devices.get(device_name) is None:
-                any_missing = True
-            if property_name is constants.ALL and len(self._devices[device_name]) == 0:
-                any_missing = True
-            if property_name is not constants.ALL and self._devices[device_name].get(property_name) is None:
-                any_missing = True
-        return any_missing
-
-    def get_properties_and_wait(self, *args, timeout_sec=5.0, wait_sleep_sec=0.1):
+            if debug:
+                log.debug("device_name=%r property_name=%r len(self._devices)=%d len(self._devices.get(device_name, []))=%d", device_name, property_name, len(self._devices), len(self._devices.get(device_name, [])))
+            if device_name is constants.ALL:
+                if len(self._devices) == 0:
+                    return True
+                continue
+            device_props = self._devices.get(device_name)
+            if not device_props:
+                return True
+            if property_name is not constants.ALL and property_name not in device_props:
+                return True
+        return False
+
+    def get_properties_and_wait(self, *args, timeout_sec=5.0, wait_sleep_sec=None):
         """After subscribing to properties, wait up to `timeout_sec` for
         the properties to become available. If the timeout expires
         and the property definitions haven't been received,
@@ -138,10 +218,10 @@ class IndiClient:
         *args
             see `get_properties`
         timeout_sec : float
-            Maximum timeout (+/- `wait_sleep_sec`)
-        wait_sleep_sec : float
-            Duration of wait between iterations of checking
-            for readiness
+            Maximum timeout
+        wait_sleep_sec : None
+            Unused, kept for compatibility. The wait ends as soon as
+            the last missing definition is handled.
 
         **Note:** For catch-all requests (i.e. all devices, or all
         properties for a given device), this waits until **one**
@@ -150,16 +230,17 @@ class IndiClient:
         later.
         """
         self.get_properties(*args)
-        start = time.time()
-
-
-
-        while time.time() - start < timeout_sec and self.interested_properties_missing:
-            time.sleep(wait_sleep_sec)
-            continue
-
-        if not self.interested_properties_missing:
-            return
+        deadline = time.monotonic() + timeout_sec
+        while True:
+            with self._interest_lock:
+                if not self.interested_properties_missing:
+                    return
+                # may still be set from before a property was deleted
+                self._interests_satisfied.clear()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._interests_satisfied.wait(remaining)
 
         property_keys = []
         for device_name, property_name in self._interested_properties:
@@ -182,17 +263,20 @@ class IndiClient:
         '''
         if self._has_connected_once and connection_status.CONNECTED:
             log.debug("Re-connecting and requesting all the same properties")
-            if (constants.ALL, constants.ALL) in self._interested_properties:
-                msg = messages.GetProperties()
+            if self._interest_all:
+                msg = self._get_properties_message()
                 self.connection.send(msg)
                 log.debug("Re-connected and issued catch-all getProperties")
             else:
-                for device_name, prop_name in self._interested_properties:
-                    self.connection.send(messages.GetProperties(
-                        device=device_name,
-                        name=prop_name if prop_name is not constants.ALL else None,
-                    ))
-                    log.debug(f"Re-connected and issued getProperties for {device_name}.{prop_name}")
+                interests = self._interested_properties
+                self.connection.send_many([
+                    self._get_properties_message(
+                        device_name,
+                        prop_name if prop_name is not constants.ALL else None,
+                    )
+                    for device_name, prop_name in interests
+                ])
+                log.debug("Re-connected and issued getProperties for %s", interests)
         elif connection_status.CONNECTED:
             self._has_connected_once = True
             log.debug("Client connected for the first time")
@@ -208,30 +292,36 @@ class IndiClient:
         self.connection.start()
 
     def _register_interest(self, device_name : str, property_name : str):
-        log.debug(f"Registering interest in {device_name=} {property_name=}")
-        self._interested_properties.add((device_name, property_name))
+        log.debug("Registering interest in device_name=%r property_name=%r", device_name, property_name)
+        with self._interest_lock:
+            self._interests_satisfied.clear()
+            if device_name is constants.ALL:
+                self._interest_all = True
+            elif property_name is constants.ALL:
+                self._interest_device.add(device_name)
+            else:
+                self._interest_prop.setdefault(device_name, set()).add(property_name)
 
     def _add_property(self, prop : properties.IndiProperty):
-        self._devices[prop.device][prop.name] = prop
-        log.debug(f"Added {prop} to properties proxy")
+        self._devices.setdefault(prop.device, {})[prop.name] = prop
+        log.debug("Added %s to properties proxy", prop)
 
     def dispatch_callbacks(self, message : messages.IndiDefSetDelMessage):
-        '''Loop through the nested dict of `self.callbacks` and compare
-        message.device and message.name to the callback keys. If matched,
-        call the corresponding callback with a `messages.IndiDefSetDelMessage`
+        '''Collect the world-, device-, and property-level callbacks
+        that match message.device and message.name, and call each with
+        a `messages.IndiDefSetDelMessage`. The lock is only held while
+        taking a snapshot of the matching callbacks.
         '''
+        if not self._cb_total:
+            return
         with self.callbacks_lock:
-            for device_name in self.callbacks:
-                for property_name in self.callbacks[device_name]:
-                    for cb in self.callbacks[device_name][property_name]:
-                        should_fire = (
-                            (device_name is constants.ALL) or
-                            (device_name == message.device and property_name is constants.ALL) or
-                            (device_name == message.device and property_name == message.name)
-                        )
-                        if should_fire:
-                            cb(message)
-                            log.debug(f"Fired {cb=}")
+            cbs = (
+                self._cb_world +
+                self._cb_device.get(message.device, []) +
+                self._cb_prop.get((message.device, message.name), [])
+            )
+        for cb in cbs:
+            cb(message)
 
     def register_callback(self,
                           cb : typing.Callable[[messages.IndiDefSetDelMessage], typing.Any],
@@ -242,16 +332,34 @@ class IndiClient:
         messages
         '''
         with self.callbacks_lock:
-            self.callbacks[device_name][property_name].append(cb)
-        log.debug(f"Registered callback {cb=} for {device_name=} {property_name=}")
+            if device_name is constants.ALL:
+                self._cb_world.append(cb)
+            elif property_name is constants.ALL:
+                self._cb_device.setdefault(device_name, []).append(cb)
+            else:
+                self._cb_prop.setdefault((device_name, property_name), []).append(cb)
+            self._cb_total += 1
+        log.debug("Registered callback cb=%r for device_name=%r property_name=%r", cb, device_name, property_name)
 
     def unregister_callback(self,
                             cb : typing.Callable[[messages.IndiDefSetDelMessage], typing.Any],
                             device_name=constants.ALL, property_name=constants.ALL):
         '''Remove a callback function from the set of callbacks for a
         `(device_name, property_name)` pair'''
-        self.callbacks[device_name][property_name].remove(cb)
-        log.debug(f"Unregistered callback {cb=} for {device_name=} {property_name=}")
+        with self.callbacks_lock:
+            if device_name is constants.ALL:
+                self._cb_world.remove(cb)
+            else:
+                if property_name is constants.ALL:
+                    bucket, key = self._cb_device, device_name
+                else:
+                    bucket, key = self._cb_prop, (device_name, property_name)
+                cbs = bucket.get(key, [])
+                cbs.remove(cb)
+                if not cbs:
+                    del bucket[key]
+            self._cb_total -= 1
+        log.debug("Unregistered callback cb=%r for device_name=%r property_name=%r", cb, device_name, property_name)
 
     def handle_message(self, message : messages.IndiDefSetDelMessage):
         """Handles property definition, updates, and deletion for all devices.
@@ -259,93 +367,105 @@ class IndiClient:
         types, the corresponding properties are created/updated/deleted as
         needed and `dispatch_callbacks` is called with the message.
         """
-        if not isinstance(message, typing.get_args(messages.IndiDefSetDelMessage)):
+        if not (self._interest_all or self._interest_device or self._interest_prop):
+            # nothing has been requested with get_properties() yet
             return
-        if isinstance(message, messages.DelProperty):
-            if message.device is None:
-                devices = self._devices.keys()
-                log.debug(f"Deleting all properties for {list(devices)}")
-                for k in devices:
-                    del self._devices[k]
-            else:
-                propnames = tuple(self._devices[message.device].keys())
-                for propname in propnames:
-                    if message.name is None or propname == message.name:
-                        try:
-                            del self._devices[message.device][propname]
-                        except KeyError:
-                            # if it was somehow deleted while we were iterating we could get a KeyError, but we were trying to delete anyway.
-                            pass
-                        log.debug(f"Deleted matching {propname} property on device {message.device}")
-        elif isinstance(message, typing.get_args(messages.IndiDefMessage) + typing.get_args(messages.IndiSetMessage)):
-            device_name = message.device
-            property_name = message.name
-            interested = (
-                (constants.ALL, constants.ALL) in self._interested_properties or
-                (device_name, constants.ALL) in self._interested_properties or
-                (device_name, property_name) in self._interested_properties
-            )
-            if not interested:
-                return
-            if device_name not in self._devices or property_name not in self._devices[device_name]:
-                if isinstance(message, typing.get_args(messages.IndiDefMessage)):
-                    self._devices[device_name][property_name] = properties.IndiProperty.from_definition(message)
-                    log.debug(f"Constructed new property {self._devices[device_name][property_name]} from definition")
-            else:
-                self._devices[message.device][message.name].apply_update(message)
-        self.dispatch_callbacks(message)
+        handler = self._message_handlers.get(type(message))
+        if handler is not None:
+            handler(message)
 
-    def __getitem__(self, key):
-        parts = key.split('.', 2)
-        device_name = parts[0]
-        if len(self._interested_properties) == 0:
-            error_suffix = ", not currently listening for any. Perhaps you need to call get_properties()?"
+    def _handle_del_property(self, message : messages.DelProperty):
+        if message.device is None:
+            self._devices.clear()
+            log.debug("Deleted all devices")
+        elif message.name is None:
+            self._devices.get(message.device, {}).clear()
+            log.debug("Deleted all properties on device %s", message.device)
         else:
-            error_suffix = ", currently listening for: " + str(self._interested_properties)
-        if device_name not in self._devices:
-            raise KeyError(f"No device {device_name} represented within these properties" + error_suffix)
-        device_props = self._devices[device_name]
-        if len(parts) > 1:
-            property_name = parts[1]
-            if property_name not in device_props:
-                raise KeyError(f"No property {device_name}.{property_name} represented within these properties" + error_suffix)
-            prop = device_props[property_name]
-            if len(parts) > 2:
-                element_name = parts[2]
-                if element_name not in prop:
-                    raise KeyError(f"No element {device_name}.{property_name}.{element_name} represented within these properties" + error_suffix)
-                return prop[element_name]
-            else:
-                return prop
+            self._devices.get(message.device, {}).pop(message.name, None)
+            log.debug("Deleted %s property on device %s", message.name, message.device)
+        self.dispatch_callbacks(message)
+
+    def _handle_def(self, message : messages.IndiDefMessage):
+        device_name = message.device
+        property_name = message.name
+        if not (
+            self._interest_all or
+            device_name in self._interest_device or
+            property_name in self._interest_prop.get(device_name, ())
+        ):
+            return
+        device_props = self._devices.get(device_name)
+        prop = device_props.get(property_name) if device_props is not None else None
+        if prop is None:
+            prop = properties.IndiProperty.from_definition(message)
+            self._devices.setdefault(device_name, {})[property_name] = prop
+            log.debug("Constructed new property %s from definition", prop)
+            if not self._interests_satisfied.is_set():
+                with self._interest_lock:
+                    if not self.interested_properties_missing:
+                        self._interests_satisfied.set()
         else:
-            return {name: prop for name, prop in device_props.items()}
+            prop.apply_update(message)
+        self.dispatch_callbacks(message)
+
+    def _handle_set(self, message : messages.IndiSetMessage):
+        device_name = message.device
+        property_name = message.name
+        if not (
+            self._interest_all or
+            device_name in self._interest_device or
+            property_name in self._interest_prop.get(device_name, ())
+        ):
+            return
+        device_props = self._devices.get(device_name)
+        prop = device_props.get(property_name) if device_props is not None else None
+        if prop is not None:
+            prop.apply_update(message)
+        self.dispatch_callbacks(message)
+
+    def _error_suffix(self):
+        '''Describe the current interests for a `KeyError` message, only
+        built when one is actually raised'''
+        interests = self._interested_properties
+        if len(interests) == 0:
+            return ", not currently listening for any. Perhaps you need to call get_properties()?"
+        return ", currently listening for: " + str(interests)
+
+    def _resolve(self, key):
+        '''Look up the parts of a ``device.property.element`` key,
+        returning ``(device_props, prop, element_name)`` where `prop`
+        and `element_name` are `None` if not part of the key'''
+        device_name, property_name, element_name = _parse_key(key)
+        device_props = self._devices.get(device_name)
+        if device_props is None:
+            raise KeyError(f"No device {device_name} represented within these properties" + self._error_suffix())
+        if property_name is None:
+            return device_props, None, None
+        prop = device_props.get(property_name)
+        if prop is None:
+            raise KeyError(f"No property {device_name}.{property_name} represented within these properties" + self._error_suffix())
+        if element_name is not None and element_name not in prop:
+            raise KeyError(f"No element {device_name}.{property_name}.{element_name} represented within these properties" + self._error_suffix())
+        return device_props, prop, element_name
+
+    def __getitem__(self, key):
+        device_props, prop, element_name = self._resolve(key)
+        if prop is None:
+            return dict(device_props)
+        if element_name is None:
+            return prop
+        return prop[element_name]
 
     def __setitem__(self, key, value):
-        parts = key.split('.', 2)
-        device_name = parts[0]
-        if len(self._interested_properties) == 0:
-            error_suffix = ", not currently listening for any. Perhaps you need to call get_properties()?"
-        else:
-            error_suffix = ", currently listening for: " + str(self._interested_properties)
-        if device_name not in self._devices:
-            raise KeyError(f"No device {device_name} represented within these properties" + error_suffix)
-        device_props = self._devices[device_name]
-        if len(parts) > 1:
-            property_name = parts[1]
-            if property_name not in device_props:
-                raise KeyError(f"No property {device_name}.{property_name} represented within these properties" + error_suffix)
-            prop = device_props[property_name]
-            if len(parts) > 2:
-                element_name = parts[2]
-                if element_name not in prop:
-                    raise KeyError(f"No element {device_name}.{property_name}.{element_name} represented within these properties" + error_suffix)
-                try:
-                    value = prop[element_name].value_from_text(value)
-                except Exception:
-                    pass  # if a proper enum value is passed in, it's not an error, but that won't go through value_from_text.
-                msg = prop.make_new_property(**{element_name: value})
-                self.connection.send(msg)
-            else:
-                return prop
-        else:
+        device_props, prop, element_name = self._resolve(key)
+        if prop is None:
             raise ValueError(f"Must supply a device.property or device.property.element string, got {key=}")
+        if element_name is None:
+            return prop
+        try:
+            value = prop[element_name].value_from_text(value)
+        except Exception:
+            pass  # if a proper enum value is passed in, it's not an error, but that won't go through value_from_text.
+        msg = prop.make_new_property(**{element_name: value})
+        self.connection.send(msg)
@@ -1,40 +1,48 @@
 import atexit
-import typing
-import datetime
 from functools import partial
 import logging
+import math
 import os
 import time
 
-from influxdb_client import WriteApi
+from influxdb_client import WriteApi, WriteOptions
 from influxdb_client.client.influxdb_client import InfluxDBClient
 
 from purepyindi2 import client, messages
+from purepyindi2.constants import RECONNECTION_DELAY_SEC
 
 logging.basicConfig(level='ERROR')
 log = logging.getLogger(__name__)
 
+_NUMBER_VECTOR_TYPES = (messages.DefNumberVector, messages.SetNumberVector)
+
 def on_exit(db_client: InfluxDBClient, write_api: WriteApi):
     write_api.close()
     db_client.close()
 
 def relay(message : messages.IndiMessage, write_api: WriteApi, bucket: str):
-    if not isinstance(message, typing.get_args(messages.DefNumberVector) + typing.get_args(messages.SetNumberVector)):
+    if not isinstance(message, _NUMBER_VECTOR_TYPES):
         return
     device_name, prop_name = message.device, message.name
+    if message.timestamp is not None:
+        timestamp_ns = int(message.timestamp.timestamp() * 1e9)
+    else:
+        timestamp_ns = time.time_ns()
+    records = []
     for element_name, elem in message.elements():
         metric_value = elem.value
-        if metric_value in (None, float('inf'), float('-inf')):
+        # line protocol has no representation for inf or nan
+        if metric_value is None or not math.isfinite(metric_value):
             continue
-        if message.timestamp is not None:
-            timestamp_ns = int(message.timestamp.timestamp() * 1e9)
-        else:
-            timestamp_ns = int(datetime.datetime.now().timestamp() * 1e9)
         # ex:
         # myMeasurement,tag1=value1,tag2=value2 fieldKey="fieldValue" 1556813561098000000
         record = f"{prop_name},xdevice={device_name} {element_name}={metric_value} {timestamp_ns}"
-        log.debug(record)
-        write_api.write(bucket=bucket, record=record)
+        log.debug("%s", record)
+        records.append(record)
+    if records:
+        # one call per message, the batching write API groups these
+        # into large requests from its own thread
+        write_api.write(bucket=bucket, record=records)
 
 def main():
     influx_url = os.environ.get('INFLUX_URL', "http://localhost:8086")
@@ -46,10 +54,15 @@ def main():
         token=influx_token,
         org=influx_org,
     )
-    write_api = db_client.write_api()
+    write_api = db_client.write_api(write_options=WriteOptions(
+        batch_size=5000,
+        flush_interval=1000,
+        jitter_interval=200,
+    ))
     atexit.register(on_exit, db_client, write_api)
 
     while True:
+        c = None
         try:
             c = client.IndiClient()
             callback = partial(relay, write_api=write_api, bucket=influx_bucket)
@@ -57,10 +70,17 @@ def main():
             c.connect()
             c.get_properties()
             log.info("Listening for metrics")
-            while True:
-                time.sleep(1)
+            # reconnection is handled by the connection, this only
+            # returns when it has stopped for good
+            c.connection.wait_for_disconnection()
+            log.info("Connection stopped, starting a new IndiClient")
         except Exception:
             log.exception("Restarting IndiClient on error...")
+        # stop the old client's threads and don't spin when the server
+        # refuses right away
+        if c is not None and c.connection is not None:
+            c.connection.stop()
+        time.sleep(RECONNECTION_DELAY_SEC)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
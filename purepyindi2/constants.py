@@ -33,28 +33,34 @@ DEFAULT_PORT = 7624
 INDI_PROTOCOL_VERSION_STRING = '1.7'
 ISO_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
 
+# value -> member dicts, built on first use of each enum type
+_ENUM_LOOKUPS = {}
+
 def parse_string_into_enum(string, enumtype):
-    for entry in enumtype:
-        if string == entry.value:
-            return entry
-    raise ValueError(f"No enum instance in {enumtype} for string {repr(string)}")
+    lookup = _ENUM_LOOKUPS.get(enumtype)
+    if lookup is None:
+        lookup = _ENUM_LOOKUPS[enumtype] = {entry.value: entry for entry in enumtype}
+    entry = lookup.get(string)
+    if entry is None:
+        raise ValueError(f"No enum instance in {enumtype} for string {repr(string)}")
+    return entry
 
 def parse_string_into_any_indi_value(string):
     '''Tries to turn `string` into a PropertyState (light), SwitchState, or floating-point number;
     falling back to returning the input string.
     '''
-    try:
-        return parse_string_into_enum(string, PropertyState)
-    except ValueError:
-        pass
-    try:
-        return parse_string_into_enum(string, SwitchState)
-    except ValueError:
-        pass
-    try:
-        return float(string)
-    except ValueError:
-        pass
+    entry = _ANY_INDI_ENUM_LOOKUP.get(string)
+    if entry is not None:
+        return entry
+    # only attempt float() when it has a chance, text values are common;
+    # non-ASCII characters go through too, since float() takes other
+    # Unicode digits
+    first = string.lstrip()[:1]
+    if first in _FLOAT_START_CHARS or not first.isascii():
+        try:
+            return float(string)
+        except ValueError:
+            pass
     return string
 
 class Role(Enum):
@@ -103,4 +109,9 @@ class SwitchRule(Enum):
     AT_MOST_ONE = 'AtMostOne'
     ANY_OF_MANY = 'AnyOfMany'
 
-AnyIndiValue = Union[PropertyState, SwitchState, float, int, str]
\ No newline at end of file
+AnyIndiValue = Union[PropertyState, SwitchState, float, int, str]
+
+# PropertyState and SwitchState values don't overlap, so one dict serves both
+_ANY_INDI_ENUM_LOOKUP = {entry.value: entry for enumtype in (SwitchState, PropertyState) for entry in enumtype}
+# ASCII characters float() accepts after leading whitespace (including inf/nan)
+_FLOAT_START_CHARS = frozenset('0123456789+-.iInN')
\ No newline at end of file
@@ -3,12 +3,11 @@ import subprocess
 import datetime
 import sys
 import os
-import psutil
 import typing
 from functools import partial
 import logging
-from collections import defaultdict
-import typing
+import threading
+from collections import deque
 from .properties import IndiProperty
 from . import messages, constants, transports, client, properties
 from .client import IndiClient
@@ -19,6 +18,8 @@ __all__ = [
 
 log = logging.getLogger(__name__)
 
+_NEW_TYPES = typing.get_args(messages.IndiNewMessage)
+
 PROPERTY_CALLBACK = typing.Callable[[properties.IndiProperty, messages.IndiDefSetDelMessage], None]
 
 class MockClient:
@@ -28,15 +29,34 @@ class MockClient:
 class Device:
     name : str
     sleep_interval_sec : float = 1
-    _setup_complete : bool = False  # set True when setup() has run
+    # if True, loop() also runs right after New* messages are handled
+    # instead of only every `sleep_interval_sec`
+    wake_on_new_message : bool = False
+    # optional sets of CPU numbers for the thread running run() and the
+    # connection's reader thread (Linux only, ignored elsewhere)
+    cpu_affinity_main : typing.Optional[set[int]] = None
+    cpu_affinity_reader : typing.Optional[set[int]] = None
     client : typing.Optional[IndiClient] = MockClient()
 
     def __init__(self, name, connection_class=transports.IndiPipeConnection):
         self.name = name
-        self.callbacks = defaultdict(list)
+        self._wakeup = threading.Event()  # interrupts the wait between loop() calls
+        self._loop_requested = False
+        # inbound messages are queued by the transport thread and handled
+        # from run() once setup() is done, so callbacks never hold up
+        # reading from the connection
+        self._inbox = deque()
+        # tuples, so a callback that adds another can't change the
+        # sequence being iterated over
+        self.callbacks : dict[str,tuple[PROPERTY_CALLBACK, ...]] = {}
+        # exact message type -> handler, everything else is ignored
+        self._message_handlers = {messages.GetProperties: self._handle_get_properties}
+        self._message_handlers.update(dict.fromkeys(_NEW_TYPES, self._handle_new))
         self.connection = connection_class()
         self.properties : dict[str,IndiProperty] = {}
-        self.connection.add_callback(constants.TransportEvent.inbound, self.handle_message)
+        self.connection.add_callback(constants.TransportEvent.inbound, self._enqueue_message)
+        # so run() notices EOF right away instead of after the next loop()
+        self.connection.add_callback(constants.TransportEvent.disconnection, self._handle_disconnection)
 
     def add_property(
         self,
@@ -50,7 +70,7 @@ class Device:
         new_property.device = self.name
         self.properties[new_property.name] = new_property
         if callback is not None:
-            self.callbacks[new_property.name].append(callback)
+            self.callbacks[new_property.name] = self.callbacks.get(new_property.name, ()) + (callback,)
 
     def define_property(self, prop : IndiProperty):
         self.connection.send(prop)
@@ -58,42 +78,68 @@ class Device:
     def delete_property(self, prop : IndiProperty):
         self.connection.send(messages.DelProperty(device=self.name, name=prop.name))
         del self.properties[prop.name]
-        del self.callbacks[prop.name]
+        self.callbacks.pop(prop.name, None)
 
     def update_property(self, prop : IndiProperty):
         self.connection.send(prop.make_set_property())
 
     def send_all_properties(self):
-        for prop_name in self.properties:
-            prop = self.properties[prop_name]
-            log.debug(f"Sending {prop=}")
-            self.define_property(prop)
+        # queued together, so the sender writes them out in one go
+        self.connection.send_many(list(self.properties.values()))
+        log.debug("Sent %d property definitions", len(self.properties))
+
+    def _enqueue_message(self, message : messages.IndiMessage):
+        self._inbox.append(message)
+        self._wakeup.set()
+
+    def _handle_disconnection(self, status : constants.ConnectionStatus):
+        self._wakeup.set()
+
+    def _drain_inbox(self):
+        inbox, handle_message = self._inbox, self.handle_message
+        while inbox:
+            message = inbox.popleft()
+            # one bad message shouldn't take down run()
+            try:
+                handle_message(message)
+            except Exception:
+                log.exception("Caught exception handling message=%r", message)
 
     def handle_message(self, message : messages.IndiMessage):
-        log.debug(f"Device got {message=}")
-        while not self._setup_complete:
-            log.debug(f"Delaying processing of message {message} until setup completes")
-            time.sleep(0.1)
-        if isinstance(message, messages.GetProperties):
-            log.debug("Get properties got")
-            if message.device is None:
-                log.debug("Sending all properties (catch-all getProperties)")
+        log.debug("Device got message=%r", message)
+        handler = self._message_handlers.get(type(message))
+        if handler is not None:
+            handler(message)
+
+    def _handle_get_properties(self, message : messages.GetProperties):
+        log.debug("Get properties got")
+        if message.device is None:
+            log.debug("Sending all properties (catch-all getProperties)")
+            self.send_all_properties()
+        elif message.device == self.name:
+            if message.name is not None:
+                prop = self.properties.get(message.name)
+                if prop is not None:
+                    self.connection.send(prop)
+            else:
+                log.debug("Sending all properties (for device %s)", message.device)
                 self.send_all_properties()
-            elif message.device == self.name:
-                if message.name is not None:
-                    if message.name in self.properties:
-                        self.connection.send(self.properties[message.name])
-                else:
-                    log.debug(f"Sending all properties (for device {message.device})")
-                    self.send_all_properties()
-        elif isinstance(message, typing.get_args(messages.IndiNewMessage)):
-            if message.device == self.name and message.name in self.properties:
-                for cb in self.callbacks[message.name]:
-                    try:
-                        cb(self.properties[message.name], message)
-                        log.debug(f"Fired callback {cb=} with {message=}")
-                    except Exception:
-                        log.exception(f"Caught exception from property {message.name} callback {cb}")
+
+    def _handle_new(self, message : messages.IndiNewMessage):
+        name = message.name
+        prop = self.properties.get(name)
+        if prop is None or message.device != self.name:
+            return
+        debug = log.isEnabledFor(logging.DEBUG)
+        for cb in self.callbacks.get(name, ()):
+            try:
+                cb(prop, message)
+                if debug:
+                    log.debug("Fired callback cb=%r with message=%r", cb, message)
+            except Exception:
+                log.exception("Caught exception from property %s callback %s", name, cb)
+        if self.wake_on_new_message:
+            self._loop_requested = True
 
     def setup(self):
         pass
@@ -102,12 +148,28 @@ class Device:
         pass
 
     def delete_all_properties(self):
-        for prop_name in tuple(self.properties.keys()):
-            self.delete_property(self.properties[prop_name])
-            log.debug(f"Deleted {prop_name} property")
+        # queued together so the sender writes them out in one go, and
+        # the maps are cleared once instead of popped per property
+        self.connection.send_many([
+            messages.DelProperty(device=self.name, name=prop_name)
+            for prop_name in self.properties
+        ])
+        log.debug("Deleted %d properties", len(self.properties))
+        self.properties.clear()
+        self.callbacks.clear()
+
+    def _apply_cpu_affinity(self):
+        if not hasattr(os, 'sched_setaffinity'):
+            return
+        if self.cpu_affinity_main is not None:
+            os.sched_setaffinity(0, self.cpu_affinity_main)  # 0 is the calling thread
+        reader = self.connection._reader
+        if self.cpu_affinity_reader is not None and reader is not None:
+            os.sched_setaffinity(reader.native_id, self.cpu_affinity_reader)
 
     def main(self):
         self.connection.start()
+        self._apply_cpu_affinity()
         try:
             self.run()
         finally:
@@ -134,10 +196,15 @@ class Device:
         self.client.connect()
         self.setup()
         self.send_all_properties()
-        self._setup_complete = True
+        next_loop = time.monotonic()
         while self.connection.status is constants.ConnectionStatus.CONNECTED:
-            self._wrap_loop()
-            time.sleep(self.sleep_interval_sec)
+            self._drain_inbox()
+            if self._loop_requested or time.monotonic() >= next_loop:
+                self._loop_requested = False
+                self._wrap_loop()
+                next_loop = time.monotonic() + self.sleep_interval_sec
+            if self._wakeup.wait(max(0.0, next_loop - time.monotonic())):
+                self._wakeup.clear()
 
     def loop(self):
         log.debug("device %s: placeholder loop logic", self.name)
@@ -1,7 +1,7 @@
 from typing import Optional, Union, get_args, ClassVar
 from xml.etree import ElementTree as Etree
 import warnings
-from functools import partial
+from functools import partial, lru_cache
 import datetime
 from . import constants
 from .vendor import dataclasses
@@ -51,7 +51,11 @@ def format_datetime_as_iso(dt):
     return dt.astimezone(datetime.timezone.utc).strftime(constants.ISO_TIMESTAMP_FORMAT)
 
 
-message = partial(dataclasses.dataclass, kw_only=True)
+# Messages are created for every element of every inbound update, so
+# they use __slots__ instead of a per-instance __dict__. Note that
+# dataclass(slots=True) returns a new class, which breaks zero-argument
+# super() in methods; use the explicit super(Class, self) form instead.
+message = partial(dataclasses.dataclass, kw_only=True, slots=True)
 
 _ATTRIBUTE_CONVERTERS = {
     "timestamp": format_datetime_as_iso,
@@ -60,7 +64,49 @@ _ATTRIBUTE_CONVERTERS = {
     "rule": lambda x: x.value,
 }
 
+@lru_cache(maxsize=None)
+def _xml_fields(cls):
+    '''(attribute name, converter) pairs for the XML attributes of `cls`'''
+    return tuple(
+        (fld.name, _ATTRIBUTE_CONVERTERS.get(fld.name, str))
+        for fld in dataclasses.fields(cls)
+        if fld.name[0] != "_"
+    )
+
+# attribute values (device, property and element names, labels, ...)
+# repeat from one message to the next, so escaping is memoized
+@lru_cache(maxsize=4096)
+def _escape_attrib(text : str) -> str:
+    '''Escape an attribute value the same way ElementTree does'''
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if '"' in text:
+        text = text.replace('"', "&quot;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    if "\n" in text:
+        text = text.replace("\n", "&#10;")
+    if "\t" in text:
+        text = text.replace("\t", "&#09;")
+    return text
+
+def _escape_cdata(text : str) -> str:
+    '''Escape element text the same way ElementTree does'''
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
 class MessageBase:
+    __slots__ = ()
+
     @classmethod
     def tag(cls):
         x = cls.__name__
@@ -68,21 +114,34 @@ class MessageBase:
 
     def to_xml_element(self) -> Etree.Element:
         this = Etree.Element(self.tag())
-        flds = [x.name for x in dataclasses.fields(self) if x.name[0] != "_"]
-        for attrname in flds:
+        for attrname, attr_converter in _xml_fields(type(self)):
             attrval = getattr(self, attrname, None)
             if attrval is not None:
-                attr_converter = _ATTRIBUTE_CONVERTERS.get(attrname, str)
                 this.set(attrname, attr_converter(attrval))
         return this
 
+    def _write_xml(self, out : list[str]):
+        '''Append the serialized form of this message to `out`. Produces
+        the same XML as serializing `to_xml_element()`, without building
+        the element tree first.'''
+        tag = self.tag()
+        out.append("<" + tag)
+        for attrname, attr_converter in _xml_fields(type(self)):
+            attrval = getattr(self, attrname, None)
+            if attrval is not None:
+                out.append(f' {attrname}="{_escape_attrib(attr_converter(attrval))}"')
+        self._write_xml_content(out, tag)
+
+    def _write_xml_content(self, out : list[str], tag : str):
+        out.append(" />")
+
     def to_xml_bytes(self) -> bytes:
-        return Etree.tostring(
-            self.to_xml_element(), encoding="utf8", xml_declaration=False
-        )
+        return self.to_xml_str().encode("utf8")
 
     def to_xml_str(self) -> str:
-        return self.to_xml_bytes().decode("utf8")
+        out = []
+        self._write_xml(out)
+        return "".join(out)
 
 
 @message
@@ -91,6 +150,8 @@ class ValueMessageBase(MessageBase):
     # default None because parser instantiates subclasses before
     # chardata has been seen to set _value:
     _value: object = dataclasses.field(default=None)
+    # values of this type are stored as-is on construction
+    _NATIVE_TYPE : ClassVar = ()
 
     def get(self):
         return self._value
@@ -117,7 +178,12 @@ class ValueMessageBase(MessageBase):
                 raise RuntimeError(f"Couldn't interpret {new_value=} as text or validated <{self.tag()}> value (original exception: {e})")
 
     def __post_init__(self):
-        self.value = self._value  # pass it through the validating setter
+        value = self._value
+        # unset (as from the parser) or already the right type, nothing
+        # for the setter to convert
+        if value is None or isinstance(value, self._NATIVE_TYPE):
+            return
+        self.value = value  # pass it through the validating setter
 
     def set_from_text(self, value):
         if value is None:
@@ -126,7 +192,7 @@ class ValueMessageBase(MessageBase):
         self._value = self.value_from_text(value)
 
     def to_xml_element(self):
-        el = super().to_xml_element()
+        el = super(ValueMessageBase, self).to_xml_element()
         if isinstance(self._value, Enum):
             text = self._value.value
         elif self._value is not None:
@@ -136,9 +202,23 @@ class ValueMessageBase(MessageBase):
         el.text = text
         return el
 
+    def _write_xml_content(self, out, tag):
+        value = self._value
+        if isinstance(value, Enum):
+            text = value.value
+        elif value is not None:
+            text = str(value)
+        else:
+            text = ""
+        if text:
+            out.append(f">{_escape_cdata(text)}</{tag}>")
+        else:
+            out.append(" />")
+
 @message
 class OneText(ValueMessageBase):
-    _value: str
+    _value: str = None
+    _NATIVE_TYPE : ClassVar = str
 
     def validate(self, value):
         try:
@@ -149,7 +229,8 @@ class OneText(ValueMessageBase):
 
 @message
 class OneNumber(ValueMessageBase):
-    _value: float
+    _value: float = None
+    _NATIVE_TYPE : ClassVar = float
 
     @staticmethod
     def value_from_text(value):
@@ -170,24 +251,35 @@ class OneNumber(ValueMessageBase):
         except Exception:
             return False
 
+_SWITCH_STATES = {entry.value: entry for entry in constants.SwitchState}
+_PROPERTY_STATES = {entry.value: entry for entry in constants.PropertyState}
+
 @message
 class OneSwitch(ValueMessageBase):
-    _value: constants.SwitchState
+    _value: constants.SwitchState = None
+    _NATIVE_TYPE : ClassVar = constants.SwitchState
 
     @staticmethod
     def value_from_text(value):
-        return constants.parse_string_into_enum(value, constants.SwitchState)
+        try:
+            return _SWITCH_STATES[value]
+        except KeyError:
+            raise ValueError(f"No enum instance in {constants.SwitchState} for string {repr(value)}")
 
     def validate(self, value) -> bool:
         return isinstance(value, constants.SwitchState)
 
 @message
 class OneLight(ValueMessageBase):
-    _value: constants.PropertyState
+    _value: constants.PropertyState = None
+    _NATIVE_TYPE : ClassVar = constants.PropertyState
 
     @staticmethod
     def value_from_text(value):
-        return constants.parse_string_into_enum(value, constants.SwitchState)
+        try:
+            return _PROPERTY_STATES[value]
+        except KeyError:
+            raise ValueError(f"No enum instance in {constants.PropertyState} for string {repr(value)}")
 
     def validate(self, value) -> bool:
         return isinstance(value, constants.PropertyState)
@@ -212,14 +304,15 @@ class DefNumber(DefValueMessageBase, OneNumber):
 
 @message
 class DefSwitch(DefValueMessageBase, OneSwitch):
-    _value: constants.SwitchState
+    _value: constants.SwitchState = None
 
 
 @message
 class DefLight(DefValueMessageBase, OneLight):
-    _value: constants.PropertyState
+    _value: constants.PropertyState = None
 
 IndiDefElementMessage = Union[DefText, DefNumber, DefSwitch, DefLight]
+_DEF_ELEMENT_TYPES = get_args(IndiDefElementMessage)
 
 @message
 class PropertyMessageBase(MessageBase):
@@ -234,11 +327,20 @@ class PropertyMessageBase(MessageBase):
         self._elements[element.name] = element
 
     def to_xml_element(self):
-        el = super().to_xml_element()
+        el = super(PropertyMessageBase, self).to_xml_element()
         for property_element in self._elements:
             el.append(self._elements[property_element].to_xml_element())
         return el
 
+    def _write_xml_content(self, out, tag):
+        if not self._elements:
+            out.append(" />")
+            return
+        out.append(">")
+        for element in self._elements.values():
+            element._write_xml(out)
+        out.append(f"</{tag}>")
+
     def elements(self):
         return self._elements.items()
 
@@ -259,17 +361,20 @@ class PropertyMessageBase(MessageBase):
         if message.timestamp is not None:
             self.timestamp = message.timestamp
             did_change = True
-        for element_name in message:
-            if element_name not in self:
-                if isinstance(message[element_name], get_args(IndiDefElementMessage)):
+        elements = self._elements
+        for element_name, new_element in message._elements.items():
+            element = elements.get(element_name)
+            if element is None:
+                if isinstance(new_element, _DEF_ELEMENT_TYPES):
                     # handle redefinition
-                    self.add_element(message[element_name])
+                    self.add_element(new_element)
                     did_change = True
                 else:
-                    log.debug(f"Got element {element_name} as {message[element_name]} but haven't seen it before")
-            current_value = self._elements[element_name]._value
-            if current_value != message._elements[element_name]._value:
-                self._elements[element_name]._value = message._elements[element_name]._value
+                    log.debug(f"Got element {element_name} as {new_element} but haven't seen it before")
+                continue
+            new_value = new_element._value
+            if element._value != new_value:
+                element._value = new_value
                 did_change = True
         return did_change
 
@@ -282,7 +387,7 @@ class DefSetMessageBase(PropertyMessageBase):
     group: Optional[str] = None
 
     def apply_update(self, message):
-        did_change = super().apply_update(message)
+        did_change = super(DefSetMessageBase, self).apply_update(message)
         if message.timeout is not None:
             self.timeout = message.timeout
             did_change = True
@@ -306,7 +411,7 @@ class DefSettableVector(DefVector):
     perm: constants.PropertyPerm
 
     def apply_update(self, message):
-        did_change = super().apply_update(message)
+        did_change = super(DefSettableVector, self).apply_update(message)
         if hasattr(message, 'perm'):
             self.perm = message.perm
             did_change = True
@@ -332,7 +437,7 @@ class DefSwitchVector(DefSettableVector):
     _kind : constants.PropertyKind = constants.PropertyKind.SWITCH
 
     def apply_update(self, message):
-        did_change = super().apply_update(message)
+        did_change = super(DefSwitchVector, self).apply_update(message)
         if hasattr(message, 'rule'):
             self.rule = message.rule
             did_change = True
@@ -1,5 +1,7 @@
 from xml.parsers import expat
 import datetime
+import sys
+from functools import lru_cache
 from .constants import (
     ISO_TIMESTAMP_FORMAT,
     PropertyPerm,
@@ -17,151 +19,201 @@ from .messages import IndiElementMessage
 
 log = logging.getLogger(__name__)
 
+def intern_optional(value : typing.Optional[str]) -> typing.Optional[str]:
+    '''Intern device and property names, which are few and
+    used over and over as dict keys'''
+    if value is None:
+        return None
+    return sys.intern(value)
+
 try:
     import ciso8601
     _parse_datetime = ciso8601.parse_datetime
-    def parse_optional_timestamp(timestamp : typing.Optional[str]) -> typing.Optional[datetime.datetime]:
-        if timestamp is None:
-            return None
-        return ciso8601.parse_datetime(timestamp)
 except ImportError:
-    def parse_optional_timestamp(timestamp : typing.Optional[str]) -> typing.Optional[datetime.datetime]:
-        if timestamp is None:
-            return None
+    log.debug("ciso8601 not available, falling back to strptime for timestamps (install the 'speedup' extra)")
+    def _parse_datetime(timestamp : str) -> datetime.datetime:
         dt = datetime.datetime.strptime(timestamp, ISO_TIMESTAMP_FORMAT)
-        dt = dt.replace(tzinfo=datetime.timezone.utc)
-        return dt
+        return dt.replace(tzinfo=datetime.timezone.utc)
+
+# every element of a vector, and often several vectors in a row, carry
+# the same timestamp string; datetimes are immutable, so share them
+_parse_timestamp = lru_cache(maxsize=1024)(_parse_datetime)
+
+def parse_optional_timestamp(timestamp : typing.Optional[str]) -> typing.Optional[datetime.datetime]:
+    if timestamp is None:
+        return None
+    return _parse_timestamp(timestamp)
 
 class IndiStreamParser:
     PROPERTY_DEF_LOOKUP = {x.tag(): x for x in typing.get_args(IndiDefMessage)}
     PROPERTY_SET_LOOKUP = {x.tag(): x for x in typing.get_args(IndiSetMessage)}
     PROPERTY_NEW_LOOKUP = {x.tag(): x for x in typing.get_args(IndiNewMessage)}
     PROPERTY_ELEMENT_LOOKUP = {x.tag(): x for x in typing.get_args(IndiElementMessage)}
+    DEF_ELEMENT_TYPES = typing.get_args(IndiDefElementMessage)
+    TOP_LEVEL_TAGS = frozenset(x.tag() for x in typing.get_args(IndiTopLevelMessage))
 
-    def __init__(self, update_queue):
+    def __init__(self, update_queue=None):
         self.update_queue = update_queue
+        # top-level messages completed during the current parse() call
+        self._completed : list[IndiTopLevelMessage] = []
         self.current_indi_element : typing.Optional[IndiElementMessage] = None
         self.pending_update : typing.Optional[IndiTopLevelMessage] = None
-        self.accumulated_chardata : str = ''
+        # chunks of character data since the last closing tag, joined
+        # once when the element closes instead of concatenated per chunk
+        self.accumulated_chardata : list[str] = []
         self.accumulated_elements : list[IndiElementMessage] = []
+        # tag name -> start handler, so each opening tag costs one lookup
+        self._start_handlers = {'indi': self._start_indi}
+        for lookup, handler in (
+            (self.PROPERTY_DEF_LOOKUP, self._start_def_vector),
+            (self.PROPERTY_SET_LOOKUP, self._start_set_vector),
+            (self.PROPERTY_NEW_LOOKUP, self._start_new_vector),
+            (self.PROPERTY_ELEMENT_LOOKUP, self._start_element),
+        ):
+            self._start_handlers.update(dict.fromkeys(lookup, handler))
+        self._start_handlers[DelProperty.tag()] = self._start_del_property
+        self._start_handlers[GetProperties.tag()] = self._start_get_properties
+        self._start_handlers[Message.tag()] = self._start_message
         self.parser = self._new_parser()
 
     def _new_parser(self):
         parser = expat.ParserCreate()
+        # coalesce runs of character data into one handler call
+        parser.buffer_text = True
         parser.StartElementHandler = self.start_xml_element_handler
         parser.EndElementHandler = self.end_xml_element_handler
         parser.CharacterDataHandler = self.character_data_handler
         parser.Parse('<indi>')  # Fool parser into thinking this is all one long XML document
         return parser
 
-    def parse(self, data : str):
+    def parse(self, data : str) -> list[IndiTopLevelMessage]:
+        '''Feed `data` to the parser and return the messages it
+        completed, in order. They are also put on `update_queue`, if
+        the parser was given one.'''
         try:
             self.parser.Parse(data)
         except expat.ExpatError as e:
             self.parser = self._new_parser()
-            self.accumulated_chardata = ''
+            self.accumulated_chardata.clear()
             self.pending_update = None
             self.current_indi_element = None
             log.warning(f"reset parser state after encountering bad input: {e}")
+        completed, self._completed = self._completed, []
+        if self.update_queue is not None:
+            for update in completed:
+                self.update_queue.put_nowait(update)
+        return completed
 
     def start_xml_element_handler(self, tag_name : str, tag_attributes : str):
-        if self.accumulated_chardata.strip():
-            log.debug(f'character data {repr(self.accumulated_chardata)} cannot be sibling of element, discarding')
-        if tag_name in self.PROPERTY_DEF_LOOKUP:
-            if self.pending_update is not None:
-                log.debug(f'property definition happening while we '
-                      f'thought something else was happening. '
-                      f'Discarded pending update was: '
-                      f'{self.pending_update}')
-            cls : IndiDefMessage = self.PROPERTY_DEF_LOOKUP[tag_name]
-            kwargs = dict(
-                device=tag_attributes['device'],
-                name=tag_attributes['name'],
-                timeout=tag_attributes.get('timeout'),
-                timestamp=parse_optional_timestamp(tag_attributes.get('timestamp')),
-                message=tag_attributes.get('message'),
-                state=parse_string_into_enum(tag_attributes['state'], PropertyState),
+        if any(chunk.strip() for chunk in self.accumulated_chardata):
+            log.debug(f'character data {repr("".join(self.accumulated_chardata))} cannot be sibling of element, discarding')
+        handler = self._start_handlers.get(tag_name)
+        if handler is None:
+            log.debug(f"Unhandled tag <{tag_name}> opened")
+            return
+        handler(tag_name, tag_attributes)
+
+    def _start_def_vector(self, tag_name, tag_attributes):
+        if self.pending_update is not None:
+            log.debug(f'property definition happening while we '
+                    f'thought something else was happening. '
+                    f'Discarded pending update was: '
+                    f'{self.pending_update}')
+        cls : IndiDefMessage = self.PROPERTY_DEF_LOOKUP[tag_name]
+        kwargs = dict(
+            device=sys.intern(tag_attributes['device']),
+            name=sys.intern(tag_attributes['name']),
+            timeout=tag_attributes.get('timeout'),
+            timestamp=parse_optional_timestamp(tag_attributes.get('timestamp')),
+            message=tag_attributes.get('message'),
+            state=parse_string_into_enum(tag_attributes['state'], PropertyState),
+            label=tag_attributes.get('label'),
+            group=tag_attributes.get('group'),
+        )
+        if issubclass(cls, DefSettableVector):
+            kwargs['perm'] = parse_string_into_enum(tag_attributes['perm'], PropertyPerm)
+        if issubclass(cls, DefSwitchVector):
+            kwargs['rule'] = parse_string_into_enum(tag_attributes['rule'], SwitchRule)
+        self.pending_update = cls(**kwargs)
+
+    def _start_set_vector(self, tag_name, tag_attributes):
+        if self.pending_update is not None:
+            log.debug(f'property setting happening while we thought '
+                    f'something else was happening. '
+                    f'Discarded pending update was: '
+                    f'{self.pending_update}')
+        cls : IndiSetMessage = self.PROPERTY_SET_LOOKUP[tag_name]
+        state = tag_attributes.get('state')
+        self.pending_update = cls(
+            device=sys.intern(tag_attributes['device']),
+            name=sys.intern(tag_attributes['name']),
+            timeout=tag_attributes.get('timeout'),
+            timestamp=parse_optional_timestamp(tag_attributes.get('timestamp')),
+            message=tag_attributes.get('message'),
+            state=parse_string_into_enum(state, PropertyState) if state is not None else None,
+        )
+
+    def _start_new_vector(self, tag_name, tag_attributes):
+        if self.pending_update is not None:
+            log.debug(f'property new value arriving while we thought '
+                    f'something else was happening. '
+                    f'Discarded pending update was: '
+                    f'{self.pending_update}')
+        cls : IndiNewMessage = self.PROPERTY_NEW_LOOKUP[tag_name]
+        self.pending_update = cls(device=sys.intern(tag_attributes['device']), name=sys.intern(tag_attributes['name']), timestamp=parse_optional_timestamp(tag_attributes.get('timestamp')))
+
+    def _start_element(self, tag_name, tag_attributes):
+        if self.pending_update is None:
+            log.debug(f'Element definition/setting happening outside property definition/setting')
+            self.current_indi_element = None
+            return
+        cls = self.PROPERTY_ELEMENT_LOOKUP[tag_name]
+        name = sys.intern(tag_attributes['name'])
+        # keywords passed directly, elements are created at the highest rate
+        if cls is DefNumber:
+            self.current_indi_element = cls(
+                name=name,
                 label=tag_attributes.get('label'),
-                group=tag_attributes.get('group'),
-            )
-            if issubclass(cls, DefSettableVector):
-                kwargs['perm'] = parse_string_into_enum(tag_attributes['perm'], PropertyPerm)
-            if issubclass(cls, DefSwitchVector):
-                kwargs['rule'] = parse_string_into_enum(tag_attributes['rule'], SwitchRule)
-            self.pending_update = cls(**kwargs)
-        elif tag_name in self.PROPERTY_SET_LOOKUP:
-            if self.pending_update is not None:
-                log.debug(f'property setting happening while we thought '
-                      f'something else was happening. '
-                      f'Discarded pending update was: '
-                      f'{self.pending_update}')
-            cls : IndiSetMessage = self.PROPERTY_SET_LOOKUP[tag_name]
-            state = parse_string_into_enum(tag_attributes['state'], PropertyState) if 'state' in tag_attributes else None
-            kwargs = dict(
-                device=tag_attributes['device'],
-                name=tag_attributes['name'],
-                timeout=tag_attributes.get('timeout'),
-                timestamp=parse_optional_timestamp(tag_attributes.get('timestamp')),
-                message=tag_attributes.get('message'),
-                state=state,
+                format=tag_attributes['format'],
+                min=float(tag_attributes['min']),
+                max=float(tag_attributes['max']),
+                step=float(tag_attributes['step']),
             )
-            self.pending_update = cls(**kwargs)
-        elif tag_name in self.PROPERTY_NEW_LOOKUP:
-            if self.pending_update is not None:
-                log.debug(f'property new value arriving while we thought '
-                      f'something else was happening. '
-                      f'Discarded pending update was: '
-                      f'{self.pending_update}')
-            cls : IndiNewMessage = self.PROPERTY_NEW_LOOKUP[tag_name]
-            self.pending_update = cls(device=tag_attributes['device'], name=tag_attributes['name'], timestamp=parse_optional_timestamp(tag_attributes.get('timestamp')))
-        elif tag_name in self.PROPERTY_ELEMENT_LOOKUP:
-            if self.pending_update is None:
-                log.debug(f'Element definition/setting happening outside property definition/setting')
-                self.current_indi_element = None
-                return
-            cls = self.PROPERTY_ELEMENT_LOOKUP[tag_name]
-            kwargs = dict(
-                name=tag_attributes['name'],
-            )
-            if issubclass(cls, typing.get_args(IndiDefElementMessage)):
-                kwargs['label'] = tag_attributes.get('label')
-            if cls is DefNumber:
-                kwargs.update({
-                    'format': tag_attributes['format'],
-                    'min': float(tag_attributes['min']),
-                    'max': float(tag_attributes['max']),
-                    'step': float(tag_attributes['step']),
-                })
-            self.current_indi_element = cls(**kwargs)
-        elif tag_name == DelProperty.tag():
-            self.pending_update = DelProperty(
-                device=tag_attributes.get('device'),
-                name=tag_attributes.get('name'),
-                timestamp=parse_optional_timestamp(tag_attributes.get('timestamp')),
-                message=tag_attributes.get('message')
-            )
-        elif tag_name == GetProperties.tag():
-            self.pending_update = GetProperties(
-                device=tag_attributes.get('device'),
-                name=tag_attributes.get('name'),
-                version=tag_attributes.get('version'),
-            )
-        elif tag_name == Message.tag():
-            self.pending_update = Message(
-                device=tag_attributes.get('device'),
-                timestamp=parse_optional_timestamp(tag_attributes.get('timestamp')),
-                message=tag_attributes.get('message'),
-            )
-        elif tag_name == "indi":
-            # poked into parser by us at init so it treats the whole
-            # incoming stream as one document
-            pass
+        elif cls in self.DEF_ELEMENT_TYPES:
+            self.current_indi_element = cls(name=name, label=tag_attributes.get('label'))
         else:
-            log.debug(f"Unhandled tag <{tag_name}> opened")
+            self.current_indi_element = cls(name=name)
+
+    def _start_del_property(self, tag_name, tag_attributes):
+        self.pending_update = DelProperty(
+            device=intern_optional(tag_attributes.get('device')),
+            name=intern_optional(tag_attributes.get('name')),
+            timestamp=parse_optional_timestamp(tag_attributes.get('timestamp')),
+            message=tag_attributes.get('message')
+        )
+
+    def _start_get_properties(self, tag_name, tag_attributes):
+        self.pending_update = GetProperties(
+            device=intern_optional(tag_attributes.get('device')),
+            name=intern_optional(tag_attributes.get('name')),
+            version=tag_attributes.get('version'),
+        )
+
+    def _start_message(self, tag_name, tag_attributes):
+        self.pending_update = Message(
+            device=tag_attributes.get('device'),
+            timestamp=parse_optional_timestamp(tag_attributes.get('timestamp')),
+            message=tag_attributes.get('message'),
+        )
+
+    def _start_indi(self, tag_name, tag_attributes):
+        # poked into parser by us at init so it treats the whole
+        # incoming stream as one document
+        pass
 
     def end_xml_element_handler(self, tag_name):
-        contents = self.accumulated_chardata.strip()
-        self.accumulated_chardata = ''
+        contents = ''.join(self.accumulated_chardata).strip()
+        self.accumulated_chardata.clear()
         if tag_name in self.PROPERTY_ELEMENT_LOOKUP:
             element = self.current_indi_element
             if element is None:
@@ -174,21 +226,15 @@ class IndiStreamParser:
             element.set_from_text(contents)
             self.pending_update.add_element(element)
             self.current_indi_element = None
-        elif (
-            tag_name == GetProperties.tag() or
-            tag_name == DelProperty.tag() or
-            tag_name == Message.tag() or
-            tag_name in self.PROPERTY_DEF_LOOKUP or 
-            tag_name in self.PROPERTY_SET_LOOKUP or 
-            tag_name in self.PROPERTY_NEW_LOOKUP
-        ):
-            log.debug("Placing update in queue:")
-            log.debug(pformat(self.pending_update))
-            self.update_queue.put_nowait(self.pending_update)
+        elif tag_name in self.TOP_LEVEL_TAGS:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Completed update:")
+                log.debug(pformat(self.pending_update))
+            self._completed.append(self.pending_update)
             self.pending_update = None
             log.debug("Cleared pending update")
         else:
             log.debug(f"Unhandled tag <{tag_name}> closed")
 
     def character_data_handler(self, data):
-        self.accumulated_chardata += data
+        self.accumulated_chardata.append(data)
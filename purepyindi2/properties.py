@@ -1,5 +1,5 @@
 from __future__ import annotations
-from functools import wraps
+from functools import wraps, lru_cache
 import typing
 import logging
 from .vendor import dataclasses
@@ -11,6 +11,14 @@ log = logging.getLogger(__name__)
 class NoSuchElementException(Exception):
     pass
 
+@lru_cache(maxsize=None)
+def _field_names(cls):
+    return tuple(fld.name for fld in dataclasses.fields(cls))
+
+@lru_cache(maxsize=None)
+def _public_field_names(cls):
+    return tuple(name for name in _field_names(cls) if name[0] != '_')
+
 @dataclasses.dataclass(kw_only=True)
 class IndiProperty:
     device : typing.Optional[str] = None  # omitted when used on device side
@@ -26,49 +34,52 @@ class IndiProperty:
 
     @staticmethod
     def from_definition(message):
-        for cls in (DefTextVector, DefNumberVector, DefSwitchVector, DefLightVector):
-            if isinstance(message, cls):
-                newcls = DEF_TO_PROPERTY[cls]
-                flds = dataclasses.fields(cls)
-                kwargs = {}
-                for fld in flds:
-                    kwargs[fld.name] = getattr(message, fld.name)
-                return newcls(**kwargs)
-        raise TypeError("Can only construct IndiProperty subclasses given Def*Vector instances")
-
-    def to_serializable(self):
-        return dataclasses.asdict(self)
+        defcls = type(message)
+        newcls = DEF_TO_PROPERTY.get(defcls)
+        if newcls is None:
+            # subclasses of the Def*Vector types, e.g. IndiProperty instances
+            for defcls, newcls in DEF_TO_PROPERTY.items():
+                if isinstance(message, defcls):
+                    break
+            else:
+                raise TypeError("Can only construct IndiProperty subclasses given Def*Vector instances")
+        return newcls(**{name: getattr(message, name) for name in _field_names(defcls)})
+
+    def to_serializable(self, include_role=True):
+        '''Like `dataclasses.asdict`, but without deep-copying the
+        (immutable) field values'''
+        data = {name: getattr(self, name) for name in _field_names(type(self))}
+        data['_elements'] = {
+            element_name: {name: getattr(elem, name) for name in _field_names(type(elem))}
+            for element_name, elem in self._elements.items()
+        }
+        if not include_role:
+            del data['_role']
+        return data
 
     def _construct_outbound_message(self) -> typing.Union[IndiNewMessage, IndiSetMessage]:
         if self._role is Role.CLIENT:
             cls = self.MESSAGE_NEW
         elif self._role is Role.DEVICE:
             cls = self.MESSAGE_SET
-        flds = dataclasses.fields(cls)
-        kwargs = {}
-        for fld in flds:
-            if fld.name[0] == '_':
-                continue
-            kwargs[fld.name] = getattr(self, fld.name)
-        return cls(**kwargs)
+        return cls(**{name: getattr(self, name) for name in _public_field_names(cls)})
 
     def make_set_property(self) -> IndiSetMessage:
         msg = self._construct_outbound_message()
-        for element_name in self._elements:
-            elem = self._elements[element_name]
+        element_class, msg_elements = msg.ELEMENT_CLASS, msg._elements
+        for element_name, elem in self._elements.items():
             value = elem._value
             if not elem.validate(value):
                 raise ValueError(f"Invalid value {repr(value)} for {element_name} in property {self.name}")
-            msg._elements[element_name] = msg.ELEMENT_CLASS(name=element_name, _value=value)
+            msg_elements[element_name] = element_class(name=element_name, _value=value)
         return msg
 
     def make_new_property(self, **kwargs) -> IndiNewMessage:
         msg = self._construct_outbound_message()
-        for element_name in kwargs:
-            if element_name not in self._elements:
+        for element_name, value in kwargs.items():
+            elem = self._elements.get(element_name)
+            if elem is None:
                 raise ValueError(f"No element named {repr(element_name)} in property {self.name}")
-            elem = self._elements[element_name]
-            value = kwargs[element_name]
             if not elem.validate(value):
                 raise ValueError(f"Invalid value {repr(value)} for {element_name} in property {self.name}")
             # > The Client must send all members of Number and Text
@@ -82,8 +93,9 @@ class IndiProperty:
         return msg
 
     def __setitem__(self, key, value):
-        self._elements[key].validate(value)
-        self._elements[key]._value = value
+        elem = self._elements[key]
+        elem.validate(value)
+        elem._value = value
 
 @dataclasses.dataclass(kw_only=True)
 class NumberVector(IndiProperty, DefNumberVector):
@@ -157,21 +169,21 @@ class SwitchVector(IndiProperty, DefSwitchVector):
         """
         @wraps(apply_changes)
         def wrapper(existing_property : SwitchVector, new_message : NewSwitchVector):
-            switches_on = set()
+            existing_elements = existing_property._elements
+            # Collect existing state
+            switches_on = {swname for swname, elem in existing_elements.items() if elem._value is SwitchState.ON}
+            # Collect elements that are changing state, ignoring any
+            # the property doesn't have
             switches_turned_on = set()
             switches_turned_off = set()
-            all_switches = set()
-            for swname in existing_property:
-                all_switches.add(swname)
-                # Collect existing state
-                if existing_property[swname] is SwitchState.ON:
-                    switches_on.add(swname)
-                # Collect elements that are changing state
-                if existing_property[swname] != new_message[swname]:
-                    if new_message[swname] is SwitchState.ON:
-                        switches_turned_on.add(swname)
-                    elif new_message[swname] is SwitchState.OFF:
-                        switches_turned_off.add(swname)
+            for swname, elem in new_message._elements.items():
+                existing_elem = existing_elements.get(swname)
+                if existing_elem is None or existing_elem._value is elem._value:
+                    continue
+                if elem._value is SwitchState.ON:
+                    switches_turned_on.add(swname)
+                elif elem._value is SwitchState.OFF:
+                    switches_turned_off.add(swname)
 
             if len(switches_turned_on) > 0 or len(switches_turned_off) > 0:
                 if self.rule is SwitchRule.ONE_OF_MANY:
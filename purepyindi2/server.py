@@ -6,36 +6,38 @@ from .transports import IndiTcpServerListener, IndiTcpClientConnection, IndiTcpS
 from .client import IndiClient
 from . import messages
 
+_DEFSETDEL_TYPES = typing.get_args(messages.IndiDefSetDelMessage)
+
 class IndiServerClient:
+    __slots__ = (
+        'connection',
+        'interested_properties',
+        'handle_inbound',
+        'handle_interest',
+    )
     connection : IndiTcpServerConnection
     interested_properties : set
 
-    def __init__(self, connection, handle_inbound):
+    def __init__(self, connection, handle_inbound, handle_interest=None):
         self.connection = connection
         self.interested_properties = set()
         self.handle_inbound = handle_inbound
+        # called as handle_interest(client, device_name, property_name)
+        # for each new subscription
+        self.handle_interest = handle_interest
 
     def handle_client_to_server_message(self, message):
         if not isinstance(message, messages.GetProperties):
             return
         device_name = message.device if message.device is not None else ALL
         property_name = message.name if message.name is not None else ALL
-        self.interested_properties.add((device_name, property_name))
+        key = (device_name, property_name)
+        if key not in self.interested_properties:
+            self.interested_properties.add(key)
+            if self.handle_interest is not None:
+                self.handle_interest(self, device_name, property_name)
         self.handle_inbound(message)
 
-    def handle_server_to_client_message(self, message):
-        if not isinstance(message, typing.get_args(messages.IndiDefSetDelMessage)):
-            return
-        device_name = message.device
-        property_name = message.name
-        interested = (
-            (ALL, ALL) in self.interested_properties or
-            (device_name, ALL) in self.interested_properties or
-            (device_name, property_name) in self.interested_properties
-        )
-        if interested:
-            self.connection.send(message)
-
 class IndiServer:
     remote_server_conns : dict[tuple[str, int], IndiTcpClientConnection]
     listener : IndiTcpServerListener
@@ -51,6 +53,11 @@ class IndiServer:
     ):
         self.listener = IndiTcpServerListener((bind_host, bind_port), self.accept_connection)
         self.clients = {}
+        # subscribers indexed by what they asked for, so broadcast only
+        # visits clients interested in a given message
+        self._subscribers_all : set[IndiServerClient] = set()
+        self._subscribers_device : dict[str, set[IndiServerClient]] = {}
+        self._subscribers_prop : dict[tuple[str, str], set[IndiServerClient]] = {}
         self.remote_server_clients = {}
         for remote_host, remote_port in remote_servers:
             c = IndiTcpClientConnection(host=remote_host, port=remote_port)
@@ -64,19 +71,49 @@ class IndiServer:
     def accept_connection(self, client_socket, client_host, client_port):
         conn = IndiTcpServerConnection(host=client_host, port=client_port)
         conn.start(client_socket)
-        c = IndiServerClient(conn, self.forward)
+        c = IndiServerClient(conn, self.forward, self._register_interest)
         self.clients[(client_host, client_port)] = c
         conn.add_callback(TransportEvent.connection, partial(self.client_status, client_key=(client_host, client_port)))
         conn.add_callback(TransportEvent.inbound, c.handle_client_to_server_message)
 
     def client_status(self, status : ConnectionStatus, client_key):
         if status is not ConnectionStatus.CONNECTED:
-            del self.clients[client_key]
+            client = self.clients.pop(client_key)
+            for device_name, property_name in client.interested_properties:
+                if device_name is ALL and property_name is ALL:
+                    self._subscribers_all.discard(client)
+                    continue
+                if property_name is ALL:
+                    index, key = self._subscribers_device, device_name
+                else:
+                    index, key = self._subscribers_prop, (device_name, property_name)
+                subscribers = index.get(key)
+                if subscribers is not None:
+                    subscribers.discard(client)
+                    # prune, so the index doesn't grow as clients come and go
+                    if not subscribers:
+                        del index[key]
+
+    def _register_interest(self, client : IndiServerClient, device_name, property_name):
+        if device_name is ALL and property_name is ALL:
+            self._subscribers_all.add(client)
+        elif property_name is ALL:
+            self._subscribers_device.setdefault(device_name, set()).add(client)
+        else:
+            self._subscribers_prop.setdefault((device_name, property_name), set()).add(client)
 
     def broadcast(self, indi_action):
         # TODO rewrite to r/o, filter non-visible
-        for client_key in self.clients:
-            self.clients[client_key].handle_server_to_client_message(indi_action)
+        if not isinstance(indi_action, _DEFSETDEL_TYPES):
+            return
+        device_name = indi_action.device
+        # a new set, so clients (dis)connecting meanwhile can't disturb the loop
+        subscribers = self._subscribers_all.union(
+            self._subscribers_device.get(device_name, ()),
+            self._subscribers_prop.get((device_name, indi_action.name), ()),
+        )
+        for client in subscribers:
+            client.connection.send(indi_action)
 
     def forward(self, indi_action):
         for remote in self.remote_server_clients.values():
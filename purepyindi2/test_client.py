@@ -0,0 +1,146 @@
+import threading
+from queue import Queue
+import pytest
+from . import constants, messages
+from .client import IndiClient
+from .parser import IndiStreamParser
+from .test_parser import DEF_NUMBER_PROP, SET_NUMBER_PROP, SET_NUMBER_UPDATE
+
+def parse_one(data):
+    q = Queue()
+    IndiStreamParser(q).parse(data)
+    return q.get_nowait()
+
+class RecordingConnection:
+    def __init__(self):
+        self.sent = []
+    def send(self, message):
+        self.sent.append(message)
+    def send_many(self, messages):
+        self.sent.extend(messages)
+
+def test_dispatch_callbacks_scopes():
+    c = IndiClient()
+    fired = []
+    c.register_callback(lambda msg: fired.append('world'))
+    c.register_callback(lambda msg: fired.append('device'), device_name='test')
+    c.register_callback(lambda msg: fired.append('property'), device_name='test', property_name='prop')
+    c.register_callback(lambda msg: fired.append('other'), device_name='test', property_name='other')
+    c.register_callback(lambda msg: fired.append('elsewhere'), device_name='elsewhere')
+    c.dispatch_callbacks(SET_NUMBER_UPDATE)
+    assert sorted(fired) == ['device', 'property', 'world']
+
+def test_callbacks_snapshot():
+    c = IndiClient()
+    world, device, prop = (lambda msg: None), (lambda msg: None), (lambda msg: None)
+    c.register_callback(world)
+    c.register_callback(device, device_name='test')
+    c.register_callback(prop, device_name='test', property_name='prop')
+    assert c.callbacks == {
+        constants.ALL: {constants.ALL: [world]},
+        'test': {constants.ALL: [device], 'prop': [prop]},
+    }
+    c.callbacks['test']['prop'].append(world)
+    assert c._cb_prop[('test', 'prop')] == [prop]
+
+def test_handle_message_def_then_set():
+    c = IndiClient()
+    c._register_interest(constants.ALL, constants.ALL)
+    seen = []
+    c.register_callback(seen.append, device_name='test', property_name='prop')
+    def_msg, set_msg = parse_one(DEF_NUMBER_PROP), parse_one(SET_NUMBER_PROP)
+    c.handle_message(def_msg)
+    assert c['test.prop.value'] == 0.0
+    c.handle_message(set_msg)
+    assert c['test.prop.value'] == 1.0
+    assert seen == [def_msg, set_msg]
+
+def test_handle_message_del_property():
+    c = IndiClient()
+    c._register_interest(constants.ALL, constants.ALL)
+    c.handle_message(parse_one(DEF_NUMBER_PROP))
+    c.handle_message(messages.DelProperty(device='test', name='nonexistent'))
+    assert 'prop' in c['test']
+    c.handle_message(messages.DelProperty(device='test', name='prop'))
+    assert 'prop' not in c['test']
+    c.handle_message(parse_one(DEF_NUMBER_PROP))
+    c.handle_message(messages.DelProperty(device='test'))
+    assert len(c['test']) == 0
+    c.handle_message(messages.DelProperty(device='unknown'))
+
+def test_unregister_callback_prunes_entries():
+    c = IndiClient()
+    cb = lambda msg: None
+    c.register_callback(cb, device_name='test', property_name='prop')
+    c.unregister_callback(cb, device_name='test', property_name='prop')
+    assert c._cb_prop == {}
+    assert c._cb_total == 0
+    c.dispatch_callbacks(SET_NUMBER_UPDATE)
+    assert c._cb_prop == {} and c._cb_device == {}
+
+def test_handle_message_ignores_other_messages():
+    c = IndiClient()
+    c._register_interest(constants.ALL, constants.ALL)
+    seen = []
+    c.register_callback(seen.append)
+    c.handle_message(messages.GetProperties())
+    c.handle_message(messages.NewNumberVector(device='test', name='prop'))
+    assert seen == []
+
+def test_handle_message_interest_filtering():
+    c = IndiClient()
+    seen = []
+    c.register_callback(seen.append)
+    c.handle_message(parse_one(DEF_NUMBER_PROP))
+    c.handle_message(messages.DelProperty(device='test'))
+    assert 'test' not in c.devices and seen == []
+    c._register_interest('test', 'other')
+    c.handle_message(parse_one(DEF_NUMBER_PROP))
+    assert 'test' not in c.devices
+    c._register_interest('test', 'prop')
+    c.handle_message(parse_one(DEF_NUMBER_PROP))
+    assert 'prop' in c['test']
+    c = IndiClient()
+    c._register_interest('test', constants.ALL)
+    c.handle_message(parse_one(DEF_NUMBER_PROP))
+    assert 'prop' in c['test']
+
+def test_handle_message_del_all_devices():
+    c = IndiClient()
+    c._register_interest(constants.ALL, constants.ALL)
+    c.handle_message(parse_one(DEF_NUMBER_PROP))
+    c.handle_message(messages.DelProperty(device=None))
+    assert c.devices == set()
+
+def test_get_properties_and_wait():
+    c = IndiClient()
+    c.connection = RecordingConnection()
+    timer = threading.Timer(0.05, c.handle_message, [parse_one(DEF_NUMBER_PROP)])
+    timer.start()
+    c.get_properties_and_wait('test.prop', timeout_sec=5)
+    assert 'prop' in c['test']
+    # already satisfied, returns without waiting
+    c.get_properties_and_wait('test.prop', timeout_sec=0)
+    with pytest.raises(TimeoutError):
+        c.get_properties_and_wait('test.other', timeout_sec=0.05)
+    assert len(c.connection.sent) == 3
+    # satisfied before, but the property has since been deleted
+    c.handle_message(messages.DelProperty(device='test', name='prop'))
+    with pytest.raises(TimeoutError):
+        c.get_properties_and_wait('test.prop', timeout_sec=0.05)
+
+def test_subscript_access():
+    c = IndiClient()
+    c.connection = RecordingConnection()
+    c._register_interest(constants.ALL, constants.ALL)
+    c.handle_message(parse_one(DEF_NUMBER_PROP))
+    assert c['test.prop'] is c['test']['prop']
+    assert c['test.prop.value'] == 0.0
+    for key in ('nodev', 'test.noprop', 'test.prop.noelem'):
+        with pytest.raises(KeyError):
+            c[key]
+    c['test.prop.value'] = 0.0
+    assert isinstance(c.connection.sent[-1], messages.NewNumberVector)
+    assert c.connection.sent[-1]['value'] == 0.0
+    with pytest.raises(ValueError):
+        c['test'] = 1.0
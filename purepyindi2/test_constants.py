@@ -0,0 +1,19 @@
+import pytest
+from .constants import PropertyState, SwitchState, parse_string_into_any_indi_value
+
+@pytest.mark.parametrize('string,expected', [
+    ('Ok', PropertyState.OK),
+    ('On', SwitchState.ON),
+    ('1.5', 1.5),
+    ('-inf', float('-inf')),
+    (' 2', 2.0),
+    ('\x0c3', 3.0),
+    ('\xa04', 4.0),
+    ('١', 1.0),
+    ('abc', 'abc'),
+    ('', ''),
+])
+def test_parse_string_into_any_indi_value(string, expected):
+    result = parse_string_into_any_indi_value(string)
+    assert type(result) is type(expected)
+    assert result == expected
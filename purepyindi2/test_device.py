@@ -0,0 +1,104 @@
+import os
+import threading
+from io import StringIO
+from functools import partial
+import pytest
+from . import messages, client
+from .constants import ConnectionStatus, TransportEvent
+from .device import Device
+from .properties import NumberVector
+from .transports import IndiPipeConnection
+from .test_client import RecordingConnection
+from .test_parser import NEW_NUMBER_UPDATE
+
+class DeviceConnection(RecordingConnection):
+    def __init__(self):
+        super().__init__()
+        self.status = ConnectionStatus.CONNECTED
+        self.callbacks = {}
+    def add_callback(self, event, callback):
+        self.callbacks[event] = callback
+    def receive(self, message):
+        self.callbacks[TransportEvent.inbound](message)
+    def disconnect(self):
+        self.status = ConnectionStatus.STOPPED
+        self.callbacks[TransportEvent.disconnection](self.status)
+
+class StubIndiClient:
+    def connect(self):
+        pass
+
+@pytest.fixture(autouse=True)
+def stub_client(monkeypatch):
+    # run() would otherwise open a TCP connection to an INDI server
+    monkeypatch.setattr(client, 'IndiClient', StubIndiClient)
+
+class RecordingDevice(Device):
+    def __init__(self, *args, **kwargs):
+        super().__init__('test', *args, **kwargs)
+        self.handled = []
+        self.add_property(NumberVector(name='prop'), callback=lambda prop, msg: self.handled.append(msg))
+
+def test_delete_all_properties():
+    d = Device('test', connection_class=DeviceConnection)
+    for name in ('a', 'b'):
+        d.add_property(NumberVector(name=name), callback=lambda prop, msg: None)
+    d.delete_all_properties()
+    assert d.connection.sent == [
+        messages.DelProperty(device='test', name='a'),
+        messages.DelProperty(device='test', name='b'),
+    ]
+    assert d.properties == {} and d.callbacks == {}
+
+def test_messages_during_setup_are_handled_by_run():
+    class SetupDevice(RecordingDevice):
+        def setup(self):
+            self.connection.receive(NEW_NUMBER_UPDATE)
+            assert self.handled == []
+        def loop(self):
+            self.connection.disconnect()
+    d = SetupDevice(connection_class=DeviceConnection)
+    d.run()
+    assert d.handled == [NEW_NUMBER_UPDATE]
+
+def test_drain_inbox_survives_handler_errors():
+    d = RecordingDevice(connection_class=DeviceConnection)
+    d.handle_message = lambda msg: 1 / 0
+    d.connection.receive(NEW_NUMBER_UPDATE)
+    d.connection.receive(NEW_NUMBER_UPDATE)
+    d._drain_inbox()
+    assert len(d._inbox) == 0
+
+def test_wake_on_new_message():
+    class WakingDevice(RecordingDevice):
+        sleep_interval_sec = 60
+        wake_on_new_message = True
+        def loop(self):
+            self.loops.append(list(self.handled))
+            if len(self.loops) == 2:
+                self.connection.disconnect()
+            looped.set()
+    looped = threading.Event()
+    d = WakingDevice(connection_class=DeviceConnection)
+    d.loops = []
+    thread = threading.Thread(target=d.run, daemon=True)
+    thread.start()
+    assert looped.wait(5)
+    d.connection.receive(NEW_NUMBER_UPDATE)
+    thread.join(5)
+    assert not thread.is_alive()
+    assert d.loops == [[], [NEW_NUMBER_UPDATE]]
+
+def test_run_exits_on_eof():
+    read_fd, write_fd = os.pipe()
+    inpipe = os.fdopen(read_fd, 'rb')
+    connection_class = partial(IndiPipeConnection, input_pipe=inpipe, output_pipe=StringIO())
+    d = RecordingDevice(connection_class=connection_class)
+    d.sleep_interval_sec = 60
+    thread = threading.Thread(target=d.main, daemon=True)
+    thread.start()
+    os.close(write_fd)
+    thread.join(5)
+    inpipe.close()
+    assert not thread.is_alive()
+    assert d.connection.status is ConnectionStatus.STOPPED
@@ -1,4 +1,5 @@
 from io import BytesIO
+from xml.etree import ElementTree as Etree
 import pytest
 import datetime
 from queue import Queue
@@ -93,6 +94,12 @@ def test_def_number_roundtrip(myq, parser):
     def_update_payload = myq.get()
     assert def_update_payload == DEF_NUMBER_UPDATE
 
+def test_def_number_update_bytewise(myq, parser):
+    # character data arrives split over many handler calls
+    for i in range(len(DEF_NUMBER_PROP)):
+        parser.parse(DEF_NUMBER_PROP[i:i+1])
+    assert myq.get_nowait() == DEF_NUMBER_UPDATE
+
 def test_set_number_update(myq, parser):
     input_buffer = BytesIO(SET_NUMBER_PROP)
     data = input_buffer.read(len(SET_NUMBER_PROP))
@@ -100,6 +107,12 @@ def test_set_number_update(myq, parser):
     set_update_payload = myq.get()
     assert set_update_payload == SET_NUMBER_UPDATE
 
+def test_parse_returns_completed_messages(myq, parser):
+    assert parser.parse(DEF_NUMBER_PROP + SET_NUMBER_PROP[:20]) == [DEF_NUMBER_UPDATE]
+    assert parser.parse(SET_NUMBER_PROP[20:]) == [SET_NUMBER_UPDATE]
+    assert myq.qsize() == 2
+    assert IndiStreamParser().parse(NEW_NUMBER_MESSAGE * 2) == [NEW_NUMBER_UPDATE] * 2
+
 @pytest.mark.parametrize('msg_instance', [DEF_NUMBER_UPDATE, SET_NUMBER_UPDATE, NEW_NUMBER_UPDATE, DEL_PROPERTY_UPDATE])
 def test_roundtrip(msg_instance, myq, parser):
     outbytes = msg_instance.to_xml_bytes()
@@ -108,3 +121,43 @@ def test_roundtrip(msg_instance, myq, parser):
     payload = myq.get()
     print("payload", payload)
     assert payload == msg_instance
+
+ESCAPING_UPDATE = messages.DefTextVector(
+    device="test",
+    name="prop",
+    label='a "quoted" <label> & more\n',
+    perm=PropertyPerm.READ_ONLY,
+    _elements={
+        "text": messages.DefText(name="text", _value="x < y & z > w °"),
+        "empty": messages.DefText(name="empty", _value=""),
+    },
+)
+
+@pytest.mark.parametrize('msg_instance', [
+    DEF_NUMBER_UPDATE, SET_NUMBER_UPDATE, NEW_NUMBER_UPDATE, DEL_PROPERTY_UPDATE,
+    ESCAPING_UPDATE, messages.GetProperties(), messages.SetLightVector(device="test", name="prop"),
+])
+def test_to_xml_bytes_matches_etree(msg_instance):
+    expected = Etree.tostring(msg_instance.to_xml_element(), encoding="utf8", xml_declaration=False)
+    assert msg_instance.to_xml_bytes() == expected
+
+def test_apply_update():
+    prop = messages.DefNumberVector(
+        device="test", name="prop", perm=PropertyPerm.READ_WRITE,
+        _elements={"value": messages.DefNumber(name="value", format="%g", min=0, max=0, step=0, _value=0.0)},
+    )
+    assert not prop.apply_update(messages.SetNumberVector(device="test", name="prop",
+        _elements={"value": messages.OneNumber(name="value", _value=0.0)}))
+    assert prop.apply_update(SET_NUMBER_UPDATE)
+    assert prop["value"] == 1.0
+    # elements that were never defined are skipped
+    prop.apply_update(messages.SetNumberVector(device="test", name="prop",
+        _elements={"other": messages.OneNumber(name="other", _value=2.0)}))
+    assert "other" not in prop
+
+def test_set_light_update(myq, parser):
+    parser.parse(b'<setLightVector device="test" name="lights"><oneLight name="a">Alert</oneLight></setLightVector>')
+    update = myq.get_nowait()
+    assert update._elements["a"].value is PropertyState.ALERT
+    with pytest.raises(ValueError):
+        messages.OneLight.value_from_text("On")
@@ -0,0 +1,44 @@
+from . import messages
+from .constants import SwitchRule, SwitchState, PropertyPerm
+from .properties import SwitchVector
+
+ON, OFF = SwitchState.ON, SwitchState.OFF
+
+class RecordingDevice:
+    def __init__(self):
+        self.updates = []
+    def update_property(self, prop):
+        self.updates.append(prop)
+
+def make_switch_vector(rule, **states):
+    sv = SwitchVector(name="sw", rule=rule, perm=PropertyPerm.READ_WRITE)
+    for name, state in states.items():
+        sv.add_element(messages.DefSwitch(name=name, _value=state))
+    return sv
+
+def new_switch(**states):
+    return messages.NewSwitchVector(device="test", name="sw", _elements={
+        name: messages.OneSwitch(name=name, _value=state) for name, state in states.items()
+    })
+
+def test_switch_callback_one_of_many():
+    sv = make_switch_vector(SwitchRule.ONE_OF_MANY, first=ON, second=OFF, third=OFF)
+    device, calls = RecordingDevice(), []
+    def apply_changes(turned_on, turned_off):
+        calls.append((turned_on, turned_off))
+        return True
+    callback = sv.switch_callback(apply_changes, device)
+    # only the element being switched on needs to be sent
+    callback(sv, new_switch(second=ON))
+    assert calls == [({'second'}, {'first'})]
+    assert (sv['first'], sv['second'], sv['third']) == (OFF, ON, OFF)
+    # more than one On is rejected without calling back
+    callback(sv, new_switch(first=ON, third=ON))
+    assert len(calls) == 1 and sv['second'] is ON
+    assert len(device.updates) == 2
+
+def test_switch_callback_rejected_changes():
+    sv = make_switch_vector(SwitchRule.ANY_OF_MANY, a=OFF, b=OFF)
+    callback = sv.switch_callback(lambda turned_on, turned_off: False, RecordingDevice())
+    callback(sv, new_switch(a=ON, b=OFF, unknown=ON))
+    assert (sv['a'], sv['b']) == (OFF, OFF)
@@ -0,0 +1,38 @@
+from . import messages
+from .server import IndiServer, IndiServerClient
+from .constants import ConnectionStatus
+from .test_client import RecordingConnection
+from .test_parser import SET_NUMBER_UPDATE
+
+def test_broadcast_subscriptions():
+    server = IndiServer('127.0.0.1', 0, [])
+    clients = {}
+    for key, get_properties in (
+        ('all', messages.GetProperties()),
+        ('device', messages.GetProperties(device='test')),
+        ('prop', messages.GetProperties(device='test', name='prop')),
+        ('other', messages.GetProperties(device='test', name='other')),
+        ('elsewhere', messages.GetProperties(device='elsewhere')),
+    ):
+        c = IndiServerClient(RecordingConnection(), lambda msg: None, server._register_interest)
+        server.clients[key] = c
+        c.handle_client_to_server_message(get_properties)
+        clients[key] = c
+    server.broadcast(SET_NUMBER_UPDATE)
+    server.broadcast(messages.GetProperties())
+    received = {key: c.connection.sent for key, c in clients.items()}
+    assert received == {
+        'all': [SET_NUMBER_UPDATE],
+        'device': [SET_NUMBER_UPDATE],
+        'prop': [SET_NUMBER_UPDATE],
+        'other': [],
+        'elsewhere': [],
+    }
+    server.client_status(ConnectionStatus.STOPPED, client_key='device')
+    server.broadcast(SET_NUMBER_UPDATE)
+    assert len(clients['device'].connection.sent) == 1
+    assert len(clients['all'].connection.sent) == 2
+    for key in ('all', 'prop', 'other', 'elsewhere'):
+        server.client_status(ConnectionStatus.STOPPED, client_key=key)
+    assert server._subscribers_all == set()
+    assert server._subscribers_device == {} and server._subscribers_prop == {}
@@ -1,8 +1,14 @@
+import os
+import socket
+import threading
 import time
-from io import BytesIO
-from .transports import IndiPipeConnection, IndiTcpConnection
+from io import BytesIO, StringIO
+import pytest
+from . import transports
+from .transports import IndiPipeConnection, IndiTcpConnection, sendmsg_all
 from .test_parser import NEW_NUMBER_MESSAGE, NEW_NUMBER_UPDATE
-from .constants import TransportEvent
+from .constants import ConnectionStatus, TransportEvent
+from .messages import GetProperties
 
 def test_pipe_transport():
     inbuf = BytesIO(NEW_NUMBER_MESSAGE)
@@ -14,6 +20,74 @@ def test_pipe_transport():
     conn.add_callback(TransportEvent.inbound, handler)
     conn.start()
     time.sleep(0.2)
+    assert not conn.wait_for_disconnection(timeout=0)
     conn.stop()
+    assert conn.wait_for_disconnection(timeout=0)
     assert len(msgs) == 1
     assert msgs[0] == NEW_NUMBER_UPDATE
+
+def test_pipe_transport_send_many():
+    inbuf = BytesIO()
+    outbuf = StringIO()
+    conn = IndiPipeConnection(input_pipe=inbuf, output_pipe=outbuf)
+    sent = []
+    conn.add_callback(TransportEvent.outbound, sent.append)
+    msgs = [GetProperties(device='a'), GetProperties(device='b', name='c')]
+    conn.send_many(msgs)
+    conn.start()
+    time.sleep(0.2)
+    conn.stop()
+    assert sent == msgs
+    assert outbuf.getvalue() == ''.join(msg.to_xml_str() + '\n' for msg in msgs)
+
+@pytest.mark.parametrize('have_sendmsg', [True, False])
+def test_sendmsg_all(have_sendmsg, monkeypatch):
+    monkeypatch.setattr(transports, '_HAVE_SENDMSG', have_sendmsg)
+    left, right = socket.socketpair()
+    buffers = [NEW_NUMBER_MESSAGE, b'\n'] * 2000
+    expected = b''.join(buffers)
+    received = []
+    def reader():
+        while sum(map(len, received)) < len(expected):
+            received.append(right.recv(65536))
+    thread = threading.Thread(target=reader)
+    thread.start()
+    sendmsg_all(left, buffers)
+    thread.join(5)
+    left.close()
+    right.close()
+    assert b''.join(received) == expected
+
+def test_pipe_transport_os_pipe():
+    read_fd, write_fd = os.pipe()
+    inpipe = os.fdopen(read_fd, 'rb')
+    conn = IndiPipeConnection(input_pipe=inpipe, output_pipe=StringIO())
+    msgs = []
+    conn.add_callback(TransportEvent.inbound, msgs.append)
+    conn.start()
+    os.write(write_fd, NEW_NUMBER_MESSAGE)
+    time.sleep(0.2)
+    conn.stop()
+    # the reader is waiting in poll(), so it exits without more input
+    assert not conn._reader.is_alive()
+    os.close(write_fd)
+    inpipe.close()
+    assert msgs == [NEW_NUMBER_UPDATE]
+
+@pytest.mark.parametrize('have_poll', [True, False])
+def test_pipe_transport_eof(have_poll, monkeypatch):
+    monkeypatch.setattr(transports, '_HAVE_POLL', have_poll)
+    read_fd, write_fd = os.pipe()
+    inpipe = os.fdopen(read_fd, 'rb')
+    conn = IndiPipeConnection(input_pipe=inpipe, output_pipe=StringIO())
+    msgs, statuses = [], []
+    conn.add_callback(TransportEvent.inbound, msgs.append)
+    conn.add_callback(TransportEvent.disconnection, statuses.append)
+    conn.start()
+    os.write(write_fd, NEW_NUMBER_MESSAGE)
+    os.close(write_fd)
+    assert conn.wait_for_disconnection(timeout=5)
+    assert statuses == [ConnectionStatus.STOPPED]
+    assert conn.status is ConnectionStatus.STOPPED
+    inpipe.close()
+    assert msgs == [NEW_NUMBER_UPDATE]
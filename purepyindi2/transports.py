@@ -4,6 +4,7 @@ import asyncio
 from pprint import pformat
 from collections import defaultdict
 import queue
+import select
 import socket
 import sys
 import os
@@ -31,17 +32,46 @@ __all__ = (
 
 log = logging.getLogger(__name__)
 
+# most platforms cap the number of buffers per sendmsg at 1024
+_IOV_MAX = 1024
+# neither is available on Windows
+_HAVE_SENDMSG = hasattr(socket.socket, 'sendmsg')
+_HAVE_POLL = hasattr(select, 'poll')
+
+def sendmsg_all(sock : socket.socket, buffers : list[bytes]):
+    '''Like `socket.sendall`, but scatter-gathers `buffers` with
+    `sendmsg` instead of joining them into one bytes object first
+    (falls back to `sendall` where `sendmsg` is unavailable)'''
+    if not _HAVE_SENDMSG:
+        sock.sendall(b''.join(buffers))
+        return
+    buffers = [memoryview(buf) for buf in buffers]
+    start = 0
+    while start < len(buffers):
+        sent = sock.sendmsg(buffers[start:start + _IOV_MAX])
+        while sent:
+            remaining = len(buffers[start])
+            if sent >= remaining:
+                sent -= remaining
+                start += 1
+            else:
+                buffers[start] = buffers[start][sent:]
+                sent = 0
+
 class IndiConnection:
     QUEUE_CLASS = queue.Queue
     status : ConnectionStatus = ConnectionStatus.NOT_CONFIGURED
 
     def __init__(self):
         self._outbound_queue = self.QUEUE_CLASS()
-        self._inbound_queue = self.QUEUE_CLASS()
-        self._parser = IndiStreamParser(self._inbound_queue)
+        # parsing and dispatch happen on the same reader thread (or
+        # task), so parsed messages are handed back as a list rather
+        # than through a synchronized queue
+        self._parser = IndiStreamParser()
         self._writer = self._reader = None
         self.event_callbacks = defaultdict(set)
         self.callbacks_set_lock = threading.Lock()
+        self._stopped_event = threading.Event()
 
     def add_callback(self, event: TransportEvent, callback):
         with self.callbacks_set_lock:
@@ -62,6 +92,28 @@ class IndiConnection:
     def send(self, indi_action):
         self._outbound_queue.put_nowait(indi_action)
 
+    def send_many(self, indi_actions):
+        '''Enqueue several messages at once. Messages waiting in the
+        outbound queue are written out together by the sender, so
+        these go out in a single write where the transport allows.'''
+        for indi_action in indi_actions:
+            self._outbound_queue.put_nowait(indi_action)
+
+    def _get_outbound_batch(self):
+        '''Block up to `BLOCK_TIMEOUT_SEC` for an outbound message, then
+        collect any others already waiting (raises `queue.Empty` on
+        timeout)'''
+        batch = [self._outbound_queue.get(True, BLOCK_TIMEOUT_SEC)]
+        while not self._outbound_queue.empty():
+            batch.append(self._outbound_queue.get_nowait())
+        return batch
+
+    def wait_for_disconnection(self, timeout=None):
+        '''Block until the connection has stopped for good (`stop()`
+        was called, or reconnection was given up on), or until
+        `timeout` seconds have passed. Returns True if it stopped.'''
+        return self._stopped_event.wait(timeout)
+
     def _handle_outbound(self, transport):
         raise NotImplementedError()
 
@@ -84,11 +136,15 @@ class IndiTcpConnection(IndiConnection):
         while self.status is ConnectionStatus.CONNECTED:
             try:
                 while True:
-                    msg = self._outbound_queue.get(True, BLOCK_TIMEOUT_SEC)
-                    data = msg.to_xml_bytes()
-                    transport.sendall(data + b'\n')
-                    log.debug(f"out: {data}")
-                    self.dispatch_callbacks(TransportEvent.outbound, msg)
+                    batch = self._get_outbound_batch()
+                    buffers = []
+                    for msg in batch:
+                        buffers.append(msg.to_xml_bytes())
+                        buffers.append(b'\n')
+                    sendmsg_all(transport, buffers)
+                    log.debug("out: %r", buffers)
+                    for msg in batch:
+                        self.dispatch_callbacks(TransportEvent.outbound, msg)
             except queue.Empty:
                 pass
             except socket.error:
@@ -115,13 +171,8 @@ class IndiTcpConnection(IndiConnection):
                 self.dispatch_callbacks(TransportEvent.disconnection, self.status)
                 log.debug("Got EOF from server")
                 break
-            self._parser.parse(data)
-            try:
-                while True:
-                    update = self._inbound_queue.get_nowait()
-                    self.dispatch_callbacks(TransportEvent.inbound, update)
-            except queue.Empty:
-                pass
+            for update in self._parser.parse(data):
+                self.dispatch_callbacks(TransportEvent.inbound, update)
         transport.shutdown(socket.SHUT_RD)
 
     def _start_reader_writer_threads(self):
@@ -145,11 +196,18 @@ class IndiTcpClientConnection(IndiTcpConnection):
     reconnect_automatically : bool = True
     def __init__(self, *args, reconnect_automatically=None, **kwargs):
         self._monitor = None
+        self._stop_requested = False
         if reconnect_automatically is not None:
             self.reconnect_automatically = reconnect_automatically
         super().__init__(*args, **kwargs)
     def _reconnection_monitor(self):
-        while self.status is not ConnectionStatus.STOPPED:
+        try:
+            self._monitor_connection()
+        finally:
+            self._stopped_event.set()
+
+    def _monitor_connection(self):
+        while not self._stop_requested and self.status is not ConnectionStatus.STOPPED:
             self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             try:
                 self._socket.connect((self.host, self.port))
@@ -173,6 +231,8 @@ class IndiTcpClientConnection(IndiTcpConnection):
             self._writer.join()
             self._reader.join()
 
+            if self._stop_requested:
+                break
             if not self.reconnect_automatically:
                 self.status = ConnectionStatus.ERROR
                 self.dispatch_callbacks(TransportEvent.disconnection, self.status)
@@ -185,6 +245,8 @@ class IndiTcpClientConnection(IndiTcpConnection):
 
     def start(self):
         if self.status is not ConnectionStatus.CONNECTED:
+            self._stop_requested = False
+            self._stopped_event.clear()
             self._monitor = threading.Thread(
                 target=self._reconnection_monitor,
                 name=f'{self.__class__.__name__}-monitor',
@@ -193,10 +255,12 @@ class IndiTcpClientConnection(IndiTcpConnection):
             self._monitor.start()
 
     def stop(self):
+        # also stops a monitor that is between reconnection attempts
+        self._stop_requested = True
         if self.status is ConnectionStatus.CONNECTED:
             self.status = ConnectionStatus.STOPPED
             self.dispatch_callbacks(TransportEvent.disconnection, self.status)
-            self._reconnection_monitor.join(BLOCK_TIMEOUT_SEC)
+            self._monitor.join(BLOCK_TIMEOUT_SEC)
             self._writer = None
             self._reader = None
 
@@ -205,6 +269,7 @@ class IndiTcpServerConnection(IndiTcpConnection):
     def start(self, client_socket):
         if self.status is not ConnectionStatus.CONNECTED:
             self._socket = client_socket
+            self._stopped_event.clear()
             self.status = ConnectionStatus.CONNECTED
             self._start_reader_writer_threads()
         else:
@@ -217,6 +282,7 @@ class IndiTcpServerConnection(IndiTcpConnection):
             self._writer = None
             self._reader.join(BLOCK_TIMEOUT_SEC)
             self._reader = None
+            self._stopped_event.set()
 
 class IndiTcpServerListener:
     '''Listener that binds a socket to accept incoming connections'''
@@ -249,30 +315,62 @@ class IndiPipeConnection(IndiConnection):
         log.debug("Outbound handler started")
         while self.status is ConnectionStatus.CONNECTED:
             try:
-                res = self._outbound_queue.get(True, BLOCK_TIMEOUT_SEC)
-                message_str = res.to_xml_str()
-                transport.write(message_str + '\n')
+                batch = self._get_outbound_batch()
+                message_str = ''.join([res.to_xml_str() + '\n' for res in batch])
+                transport.write(message_str)
                 log.debug(f"out: {repr(message_str)}")
                 transport.flush()
-                self.dispatch_callbacks(TransportEvent.outbound, res)
+                for res in batch:
+                    self.dispatch_callbacks(TransportEvent.outbound, res)
             except queue.Empty:
                 pass
 
+    def _read_chunks(self, transport):
+        '''Yield chunks of input while connected. Where `poll()` is
+        available, real pipes are waited on with it and read with one
+        `os.read` per wakeup, so the reader notices `stop()` instead of
+        blocking in `readline()`'''
+        try:
+            fd = transport.fileno()
+        except (AttributeError, OSError):
+            fd = None
+        if fd is None or not _HAVE_POLL:
+            while self.status is ConnectionStatus.CONNECTED:
+                data = transport.readline(CHUNK_MAX_READ_SIZE)
+                # only a real file's empty read means EOF; in-memory
+                # buffers just have nothing more for now
+                if fd is not None and not data:
+                    self._handle_eof()
+                    return
+                yield data
+            return
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        while self.status is ConnectionStatus.CONNECTED:
+            if not poller.poll(BLOCK_TIMEOUT_SEC * 1000):
+                continue
+            data = os.read(fd, CHUNK_MAX_READ_SIZE)
+            if data == b'':
+                self._handle_eof()
+                return
+            yield data
+
+    def _handle_eof(self):
+        log.debug("Got EOF on input pipe")
+        self.status = ConnectionStatus.STOPPED
+        self._stopped_event.set()
+        self.dispatch_callbacks(TransportEvent.disconnection, self.status)
+
     def _handle_inbound(self, transport):
         log.debug("Inbound handler started")
-        while self.status is ConnectionStatus.CONNECTED:
-            from_server = transport.readline(CHUNK_MAX_READ_SIZE)
+        for from_server in self._read_chunks(transport):
             log.debug(f"in: {repr(from_server)}")
-            self._parser.parse(from_server)
-            try:
-                while True:
-                    update = self._inbound_queue.get_nowait()
-                    self.dispatch_callbacks(TransportEvent.inbound, update)
-            except queue.Empty:
-                pass
+            for update in self._parser.parse(from_server):
+                self.dispatch_callbacks(TransportEvent.inbound, update)
 
     def start(self):
         if not self.status is ConnectionStatus.CONNECTED:
+            self._stopped_event.clear()
             self.status = ConnectionStatus.CONNECTED
             self._writer = threading.Thread(
                 target=self._handle_outbound,
@@ -294,6 +392,7 @@ class IndiPipeConnection(IndiConnection):
             self.status = ConnectionStatus.STOPPED
             self._writer.join(BLOCK_TIMEOUT_SEC)
             self._reader.join(BLOCK_TIMEOUT_SEC)
+            self._stopped_event.set()
 
 def is_fifo(path):
     return stat.S_ISFIFO(os.stat(path).st_mode)
@@ -422,9 +521,7 @@ class AsyncIndiTcpConnection(IndiTcpConnection):
             if data == b'':
                 log.debug("Got EOF from server")
                 raise ConnectionError("Got EOF from server")
-            self._parser.parse(data)
-            while not self._inbound_queue.empty():
-                update = await self._inbound_queue.get()
+            for update in self._parser.parse(data):
                 log.debug(f"Got update:\n{pformat(update)}")
                 self.dispatch_callbacks(TransportEvent.inbound, update)
                 await self.dispatch_async_callbacks(TransportEvent.inbound, update)
@@ -15,7 +15,6 @@ extras = {
     'indi2influx': ['influxdb-client'],
     'ipyindi': ['IPython'],
     'speedup': ['ciso8601'],
-    'device': ['psutil'],
 }
 all_deps = set()
 for _, deps in extras.items():